@@ -0,0 +1,335 @@
+import argparse
+import csv
+import io
+import os
+import re
+import urllib.request
+from bisect import bisect_left
+
+# Full airport dataset shipped with the plugin: every open OurAirports entry with an IATA code,
+# trimmed to iata,icao,city,name,country,aliases. Regenerate with `python airports.py --update`.
+DEFAULT_AIRPORTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'airports.csv')
+OURAIRPORTS_URL = 'https://davidmegginson.github.io/ourairports-data/airports.csv'
+TRIMMED_COLUMNS = ('iata', 'icao', 'city', 'name', 'country', 'aliases')
+
+# Built-in airports: IATA|ICAO|City|Airport name|Country|aliases (';'-separated).
+# Only a fallback when no full dataset is available; it is partial, so places missing from
+# it are still searched. Its aliases (e.g. Bombay) are also added to the full dataset.
+BUILTIN_AIRPORTS = """\
+BER|EDDB|Berlin|Berlin Brandenburg Airport|DE|Berlin Brandenburg;Willy Brandt
+FRA|EDDF|Frankfurt|Frankfurt Airport|DE|Frankfurt am Main;Rhein-Main
+MUC|EDDM|Munich|Munich Airport|DE|Muenchen;München;Franz Josef Strauss
+HAM|EDDH|Hamburg|Hamburg Airport|DE|Helmut Schmidt
+DUS|EDDL|Dusseldorf|Düsseldorf Airport|DE|Düsseldorf;Duesseldorf
+CGN|EDDK|Cologne|Cologne Bonn Airport|DE|Köln;Koeln;Bonn
+STR|EDDS|Stuttgart|Stuttgart Airport|DE|
+HAJ|EDDV|Hanover|Hannover Airport|DE|Hannover
+NUE|EDDN|Nuremberg|Nuremberg Airport|DE|Nürnberg;Nuernberg
+LEJ|EDDP|Leipzig|Leipzig/Halle Airport|DE|Halle
+DRS|EDDC|Dresden|Dresden Airport|DE|
+BRE|EDDW|Bremen|Bremen Airport|DE|
+DEL|VIDP|Delhi|Indira Gandhi International Airport|IN|New Delhi
+BOM|VABB|Mumbai|Chhatrapati Shivaji Maharaj International Airport|IN|Bombay
+BLR|VOBL|Bengaluru|Kempegowda International Airport|IN|Bangalore
+MAA|VOMM|Chennai|Chennai International Airport|IN|Madras
+HYD|VOHS|Hyderabad|Rajiv Gandhi International Airport|IN|
+CCU|VECC|Kolkata|Netaji Subhas Chandra Bose International Airport|IN|Calcutta
+COK|VOCI|Kochi|Cochin International Airport|IN|Cochin
+AMD|VAAH|Ahmedabad|Sardar Vallabhbhai Patel International Airport|IN|
+PNQ|VAPO|Pune|Pune Airport|IN|
+GOI|VOGO|Goa|Dabolim Airport|IN|Dabolim
+GOX|VOGA|Goa|Manohar International Airport|IN|Mopa
+TRV|VOTV|Thiruvananthapuram|Trivandrum International Airport|IN|Trivandrum
+CJB|VOCB|Coimbatore|Coimbatore International Airport|IN|
+JAI|VIJP|Jaipur|Jaipur International Airport|IN|
+LKO|VILK|Lucknow|Chaudhary Charan Singh International Airport|IN|
+ATQ|VIAR|Amritsar|Sri Guru Ram Dass Jee International Airport|IN|
+IXC|VICG|Chandigarh|Chandigarh Airport|IN|
+GAU|VEGT|Guwahati|Lokpriya Gopinath Bordoloi International Airport|IN|
+BBI|VEBS|Bhubaneswar|Biju Patnaik International Airport|IN|
+NAG|VANP|Nagpur|Dr. Babasaheb Ambedkar International Airport|IN|
+VNS|VEBN|Varanasi|Lal Bahadur Shastri International Airport|IN|Benares
+PAT|VEPT|Patna|Jay Prakash Narayan Airport|IN|
+IXE|VOML|Mangaluru|Mangalore International Airport|IN|Mangalore
+CCJ|VOCL|Kozhikode|Calicut International Airport|IN|Calicut
+VTZ|VOVZ|Visakhapatnam|Visakhapatnam Airport|IN|Vizag
+IDR|VAID|Indore|Devi Ahilya Bai Holkar Airport|IN|
+SXR|VISR|Srinagar|Sheikh ul-Alam International Airport|IN|
+IXB|VEBD|Bagdogra|Bagdogra Airport|IN|Siliguri
+LHR|EGLL|London|Heathrow Airport|GB|Heathrow
+LGW|EGKK|London|Gatwick Airport|GB|Gatwick
+STN|EGSS|London|Stansted Airport|GB|Stansted
+MAN|EGCC|Manchester|Manchester Airport|GB|
+BHX|EGBB|Birmingham|Birmingham Airport|GB|
+EDI|EGPH|Edinburgh|Edinburgh Airport|GB|
+DUB|EIDW|Dublin|Dublin Airport|IE|
+CDG|LFPG|Paris|Charles de Gaulle Airport|FR|Roissy
+ORY|LFPO|Paris|Orly Airport|FR|Orly
+NCE|LFMN|Nice|Nice Côte d'Azur Airport|FR|
+AMS|EHAM|Amsterdam|Amsterdam Airport Schiphol|NL|Schiphol
+BRU|EBBR|Brussels|Brussels Airport|BE|Zaventem
+ZRH|LSZH|Zurich|Zurich Airport|CH|Zürich;Kloten
+GVA|LSGG|Geneva|Geneva Airport|CH|Genf
+VIE|LOWW|Vienna|Vienna International Airport|AT|Wien;Schwechat
+CPH|EKCH|Copenhagen|Copenhagen Airport|DK|Kastrup
+ARN|ESSA|Stockholm|Stockholm Arlanda Airport|SE|Arlanda
+OSL|ENGM|Oslo|Oslo Airport|NO|Gardermoen
+HEL|EFHK|Helsinki|Helsinki Airport|FI|Vantaa
+WAW|EPWA|Warsaw|Warsaw Chopin Airport|PL|Warszawa
+PRG|LKPR|Prague|Václav Havel Airport Prague|CZ|Praha
+BUD|LHBP|Budapest|Budapest Ferenc Liszt International Airport|HU|
+MAD|LEMD|Madrid|Adolfo Suárez Madrid–Barajas Airport|ES|Barajas
+BCN|LEBL|Barcelona|Josep Tarradellas Barcelona–El Prat Airport|ES|El Prat
+LIS|LPPT|Lisbon|Humberto Delgado Airport|PT|Lisboa
+FCO|LIRF|Rome|Leonardo da Vinci–Fiumicino Airport|IT|Roma;Fiumicino
+MXP|LIMC|Milan|Milan Malpensa Airport|IT|Milano;Malpensa
+ATH|LGAV|Athens|Athens International Airport|GR|Athina
+IST|LTFM|Istanbul|Istanbul Airport|TR|
+SAW|LTFJ|Istanbul|Sabiha Gökçen International Airport|TR|Sabiha Gokcen
+DXB|OMDB|Dubai|Dubai International Airport|AE|
+AUH|OMAA|Abu Dhabi|Zayed International Airport|AE|
+DOH|OTHH|Doha|Hamad International Airport|QA|
+BAH|OBBI|Bahrain|Bahrain International Airport|BH|Manama
+MCT|OOMS|Muscat|Muscat International Airport|OM|
+KWI|OKKK|Kuwait City|Kuwait International Airport|KW|Kuwait
+RUH|OERK|Riyadh|King Khalid International Airport|SA|
+JED|OEJN|Jeddah|King Abdulaziz International Airport|SA|
+CAI|HECA|Cairo|Cairo International Airport|EG|
+ADD|HAAB|Addis Ababa|Addis Ababa Bole International Airport|ET|Bole
+NBO|HKJK|Nairobi|Jomo Kenyatta International Airport|KE|
+JNB|FAOR|Johannesburg|O. R. Tambo International Airport|ZA|
+CPT|FACT|Cape Town|Cape Town International Airport|ZA|
+SIN|WSSS|Singapore|Singapore Changi Airport|SG|Changi
+KUL|WMKK|Kuala Lumpur|Kuala Lumpur International Airport|MY|
+BKK|VTBS|Bangkok|Suvarnabhumi Airport|TH|
+HKG|VHHH|Hong Kong|Hong Kong International Airport|HK|Chek Lap Kok
+CMB|VCBI|Colombo|Bandaranaike International Airport|LK|
+KTM|VNKT|Kathmandu|Tribhuvan International Airport|NP|
+DAC|VGHS|Dhaka|Hazrat Shahjalal International Airport|BD|
+MLE|VRMM|Male|Velana International Airport|MV|Maldives
+PEK|ZBAA|Beijing|Beijing Capital International Airport|CN|Peking
+PVG|ZSPD|Shanghai|Shanghai Pudong International Airport|CN|Pudong
+HND|RJTT|Tokyo|Haneda Airport|JP|Haneda
+NRT|RJAA|Tokyo|Narita International Airport|JP|Narita
+ICN|RKSI|Seoul|Incheon International Airport|KR|Incheon
+SYD|YSSY|Sydney|Sydney Kingsford Smith Airport|AU|
+MEL|YMML|Melbourne|Melbourne Airport|AU|Tullamarine
+JFK|KJFK|New York|John F. Kennedy International Airport|US|NYC
+EWR|KEWR|Newark|Newark Liberty International Airport|US|New York Newark
+ORD|KORD|Chicago|O'Hare International Airport|US|O'Hare
+SFO|KSFO|San Francisco|San Francisco International Airport|US|
+LAX|KLAX|Los Angeles|Los Angeles International Airport|US|LA
+IAD|KIAD|Washington|Washington Dulles International Airport|US|Dulles
+ATL|KATL|Atlanta|Hartsfield–Jackson Atlanta International Airport|US|
+YYZ|CYYZ|Toronto|Toronto Pearson International Airport|CA|Pearson
+YVR|CYVR|Vancouver|Vancouver International Airport|CA|
+"""
+
+
+# Letters with spaces and . , ' ( ) / - in between, e.g. "St. John's" or "Frankfurt, Germany"
+PLACE_RE = re.compile(r"[^\W\d_](?:[^\W\d_]|[ .,'()/-])*")
+MAX_PLACE_LENGTH = 100
+
+
+def is_place_name(text):
+    """True if text could be an airport code or place name (not necessarily a known one)"""
+    text = str(text or '').strip()
+    return 2 <= len(text) <= MAX_PLACE_LENGTH and PLACE_RE.fullmatch(text) is not None
+
+
+class Airport:
+    """One airport entry in the index"""
+
+    __slots__ = ('iata', 'icao', 'city', 'name', 'country', 'aliases')
+
+    def __init__(self, iata, icao, city, name, country, aliases=()):
+        self.iata = iata
+        self.icao = icao
+        self.city = city
+        self.name = name
+        self.country = country
+        self.aliases = tuple(aliases)
+
+    def to_dict(self):
+        return {
+            "iata": self.iata,
+            "icao": self.icao,
+            "city": self.city,
+            "name": self.name,
+            "country": self.country
+        }
+
+
+def _normalize(text):
+    return ' '.join(str(text or '').lower().split())
+
+
+class AirportIndex:
+    """In-memory airport index: O(1) code/name lookups and O(log n) prefix search over a sorted key array"""
+
+    def __init__(self, airports, complete=False):
+        self.airports = list(airports)
+        # True when loaded from a full dataset, so a place missing from it is really unknown
+        self.complete = complete
+        self.by_code = {}
+        self.by_name = {}
+        entries = set()
+        for i, airport in enumerate(self.airports):
+            for code in (airport.iata, airport.icao):
+                if code:
+                    self.by_code[code.upper()] = airport
+                    entries.add((code.lower(), i))
+            for name in (airport.city, airport.name) + airport.aliases:
+                key = _normalize(name)
+                if key:
+                    # Several airports may share a city name; keep all of them
+                    self.by_name.setdefault(key, []).append(airport)
+                    entries.add((key, i))
+        entries = sorted(entries)
+        self._keys = [key for key, _ in entries]
+        self._rows = [row for _, row in entries]
+
+    def __len__(self):
+        return len(self.airports)
+
+    def lookup(self, text):
+        """Airports matching a code, city, airport name or alias exactly (empty list if none)"""
+        text = str(text or '').strip()
+        if not text:
+            return []
+        airport = self.by_code.get(text.upper())
+        if airport is not None:
+            return [airport]
+        key = _normalize(text)
+        matches = self.by_name.get(key)
+        if matches is None and ',' in key:
+            # Accept "Frankfurt, Germany" style input
+            matches = self.by_name.get(key.split(',', 1)[0].strip())
+        return list(matches or [])
+
+    def resolve(self, text):
+        """(search term, known) for user input: an IATA code when the input pins down one airport, else the input itself.
+
+        Codes and airport names map to their airport. A city (or alias) maps to a code only when the
+        index is complete and lists one airport for it, so a partial table never narrows a city
+        such as "New York" to one of its airports.
+        """
+        text = str(text or '').strip()
+        matches = self.lookup(text)
+        if not matches:
+            return text, False
+        airport = matches[0]
+        if len(matches) == 1 and airport.iata:
+            if text.upper() in (airport.iata, airport.icao) or _normalize(text) == _normalize(airport.name):
+                return airport.iata, True
+            if self.complete:
+                return airport.iata, True
+        return text, True
+
+    def autocomplete(self, prefix, limit=10):
+        """Airports whose code, city, name or alias starts with prefix; exact code matches first"""
+        prefix = _normalize(prefix)
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        exact = self.by_code.get(prefix.upper())
+        if exact is not None:
+            results.append(exact)
+            seen.add(id(exact))
+        start = bisect_left(self._keys, prefix)
+        for i in range(start, len(self._keys)):
+            if len(results) >= limit or not self._keys[i].startswith(prefix):
+                break
+            airport = self.airports[self._rows[i]]
+            if id(airport) not in seen:
+                seen.add(id(airport))
+                results.append(airport)
+        return results
+
+
+def load_builtin_airports():
+    airports = []
+    for line in BUILTIN_AIRPORTS.splitlines():
+        iata, icao, city, name, country, aliases = line.split('|')
+        airports.append(Airport(iata, icao, city, name, country, [a for a in aliases.split(';') if a]))
+    return airports
+
+
+def load_csv_airports(path):
+    """Load airports from a CSV with iata/icao/city/name/country columns (OurAirports column names also work)"""
+    airports = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            iata = (row.get('iata') or row.get('iata_code') or '').strip().upper()
+            icao = (row.get('icao') or row.get('icao_code') or row.get('gps_code') or '').strip().upper()
+            if not iata and not icao:
+                continue
+            aliases = [a.strip() for a in (row.get('aliases') or row.get('keywords') or '').replace(';', ',').split(',') if a.strip()]
+            airports.append(Airport(
+                iata, icao,
+                (row.get('city') or row.get('municipality') or '').strip(),
+                (row.get('name') or '').strip(),
+                (row.get('country') or row.get('iso_country') or '').strip(),
+                aliases
+            ))
+    return airports
+
+
+def trim_ourairports(source, dest):
+    """Copy the open airports with an IATA code from an OurAirports airports.csv stream to a trimmed CSV"""
+    writer = csv.writer(dest)
+    writer.writerow(TRIMMED_COLUMNS)
+    count = 0
+    for row in csv.DictReader(source):
+        iata = (row.get('iata_code') or '').strip().upper()
+        if not iata or row.get('type') == 'closed':
+            continue
+        writer.writerow((iata, (row.get('icao_code') or row.get('gps_code') or '').strip().upper(),
+                         (row.get('municipality') or '').strip(), (row.get('name') or '').strip(),
+                         (row.get('iso_country') or '').strip(), (row.get('keywords') or '').strip()))
+        count += 1
+    return count
+
+
+def update_airports_file(url=OURAIRPORTS_URL, path=DEFAULT_AIRPORTS_FILE):
+    """Download the OurAirports dataset and write the trimmed copy the plugin ships; returns the row count"""
+    with urllib.request.urlopen(url, timeout=60) as response:
+        source = io.TextIOWrapper(response, encoding='utf-8', newline='')
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', newline='', encoding='utf-8') as dest:
+            count = trim_ourairports(source, dest)
+    os.replace(temp_path, path)
+    return count
+
+
+def _add_builtin_aliases(airports):
+    """Give full-dataset airports the aliases of the built-in table (old city names, spellings)"""
+    by_iata = {airport.iata: airport for airport in airports if airport.iata}
+    for builtin in load_builtin_airports():
+        airport = by_iata.get(builtin.iata)
+        if airport is not None:
+            airport.aliases += tuple(alias for alias in builtin.aliases if alias not in airport.aliases)
+    return airports
+
+
+def build_airport_index(csv_path=None):
+    """Build the index from AIRPORTS_CSV if set, else the shipped dataset, else the partial built-in table"""
+    csv_path = csv_path or os.getenv('AIRPORTS_CSV')
+    if not csv_path and os.path.exists(DEFAULT_AIRPORTS_FILE):
+        csv_path = DEFAULT_AIRPORTS_FILE
+    if csv_path:
+        return AirportIndex(_add_builtin_aliases(load_csv_airports(csv_path)), complete=True)
+    return AirportIndex(load_builtin_airports())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Airport dataset maintenance')
+    parser.add_argument('--update', action='store_true', help=f'regenerate {os.path.basename(DEFAULT_AIRPORTS_FILE)} from OurAirports')
+    parser.add_argument('--url', default=OURAIRPORTS_URL)
+    args = parser.parse_args()
+    if args.update:
+        print(f"Wrote {update_airports_file(args.url)} airports to {DEFAULT_AIRPORTS_FILE}")
+    else:
+        index = build_airport_index()
+        print(f"{len(index)} airports loaded ({'complete' if index.complete else 'partial built-in table'})")
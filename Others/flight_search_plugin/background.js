@@ -6,11 +6,42 @@ chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
       .catch(error => sendResponse({ error: error.message }));
     return true; // Required for async response
   }
+  if (request.action === 'autocompleteAirports') {
+    autocompleteAirports(request.query)
+      .then(airports => sendResponse({ airports }))
+      .catch(error => sendResponse({ error: error.message }));
+    return true; // Required for async response
+  }
 });
 
+// Look up airports by code or city prefix
+async function autocompleteAirports(query) {
+  const response = await fetch(`http://localhost:5000/api/airports/autocomplete?q=${encodeURIComponent(query)}&limit=8`);
+  if (!response.ok) {
+    throw new Error(`HTTP error! status: ${response.status}`);
+  }
+  const data = await response.json();
+  return data.airports;
+}
+
+// Id of the search currently running on the server, cancelled when a new one starts
+let activeRequestId = null;
+
+function cancelActiveSearch() {
+  if (!activeRequestId) {
+    return;
+  }
+  fetch(`http://localhost:5000/api/requests/${activeRequestId}/cancel`, { method: 'POST' })
+    .catch(error => console.warn('Failed to cancel previous search:', error));
+  activeRequestId = null;
+}
+
 // Handle flight search
 async function handleFlightSearch(params) {
   const { departure, arrival, departureDate, returnDate, passengers } = params;
+  cancelActiveSearch();
+  const requestId = crypto.randomUUID();
+  activeRequestId = requestId;
   
   try {
     // Send request to Python server
@@ -24,19 +55,32 @@ async function handleFlightSearch(params) {
         arrival,
         departureDate,
         returnDate,
-        passengers
+        passengers,
+        requestId
       })
     });
 
+    const data = await response.json();
+    if (response.status === 400) {
+      // Invalid airport, date or passenger count; show the server's message
+      throw new Error(data.error);
+    }
+    if (response.status === 503 || response.status === 504) {
+      // Server busy or search timed out
+      throw new Error(data.error);
+    }
     if (!response.ok) {
       throw new Error(`HTTP error! status: ${response.status}`);
     }
 
-    const data = await response.json();
     return data.results;
   } catch (error) {
     console.error('Error in flight search:', error);
-    throw new Error('Failed to search for flights');
+    throw new Error(error.message || 'Failed to search for flights');
+  } finally {
+    if (activeRequestId === requestId) {
+      activeRequestId = null;
+    }
   }
 }
 
@@ -0,0 +1,293 @@
+"""Offline load benchmark for flight_server.
+
+Replaces the Gemini model with a replay stand-in (canned or recorded
+responses, injected latency and malformed JSON) and drives
+/api/search-flights through the Flask test client at a given concurrency.
+
+Examples:
+    python bench_flight_server.py --requests 200 --concurrency 8
+    python bench_flight_server.py --latency-ms 800 --malformed-rate 0.2 --unique-dates
+    python bench_flight_server.py --record recorded.jsonl --requests 5   (real Gemini calls)
+    python bench_flight_server.py --replay recorded.jsonl
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+# Canned model outputs in the shapes seen from Gemini
+CANNED_RESPONSES = [
+    json.dumps({"results": [
+        {"airline": "Lufthansa", "price": "INR 45,000", "departureTime": "10:00 AM", "arrivalTime": "11:30 PM",
+         "duration": "9h 30m", "stops": "Non-stop", "source": "Skyscanner", "recommendation": "Direct flight"},
+        {"airline": "Emirates", "price": "INR 42,500", "departureTime": "2:30 PM", "arrivalTime": "6:00 AM (next day)",
+         "duration": "8h 30m", "stops": "1 stop in Dubai", "source": "Kayak", "recommendation": "Good value"},
+        {"airline": "Qatar Airways", "price": "EUR 512", "departureTime": "4:15 PM", "arrivalTime": "8:40 AM (next day)",
+         "duration": "12h 55m", "stops": "1 stop in Doha", "source": "Google Flights", "recommendation": "Cheap"}
+    ]}),
+    "```json\n" + json.dumps({"results": [
+        {"airline": "Air India", "price": "INR 39,900", "departureTime": "9:20 PM", "arrivalTime": "9:05 AM (next day)",
+         "duration": "8h 15m", "stops": "Non-stop", "source": "Skyscanner", "recommendation": "Cheapest direct"}
+    ]}) + "\n```",
+    "Here are the flights: " + json.dumps({"flights": [
+        {"airline": "Turkish Airlines", "price": "INR 37,200", "departureTime": "6:45 AM",
+         "arrivalTime": "11:55 PM", "duration": "13h 40m", "stops": "1 stop in Istanbul", "source": "Kayak"}
+    ]}),
+    # Structured values where display strings are expected
+    json.dumps({"results": [
+        {"airline": {"name": "Lufthansa", "code": "LH"}, "price": {"amount": 45000, "currency": "INR"},
+         "departureTime": ["10:00 AM", "CET"], "arrivalTime": "11:30 PM", "duration": {"hours": 9, "minutes": 30},
+         "stops": 0, "source": ["Skyscanner"], "recommendation": None}
+    ]})
+]
+MALFORMED_RESPONSES = [
+    '{"results": [{"airline": "Lufthansa", "price": "INR 45,000", "duration": "9h 30m"',
+    "I'm sorry, I cannot search flights right now.",
+    '{"results": "none"}'
+]
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class ReplayModel:
+    """Stand-in for genai.GenerativeModel with canned responses and injected latency"""
+
+    def __init__(self, responses=None, latency_ms=500.0, jitter_ms=150.0, malformed_rate=0.0, seed=None):
+        self.responses = responses or CANNED_RESPONSES
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.malformed_rate = malformed_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.malformed_served = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        with self._lock:
+            self.calls += 1
+            malformed = self.random.random() < self.malformed_rate
+            if malformed:
+                self.malformed_served += 1
+                text = self.random.choice(MALFORMED_RESPONSES)
+            else:
+                text = self.random.choice(self.responses)
+            delay = max(0.0, self.random.gauss(self.latency_ms, self.jitter_ms)) / 1000.0
+        time.sleep(delay)
+        return _Response(text)
+
+
+class RecordingModel:
+    """Wraps the real model and appends every prompt/response pair to a JSONL file"""
+
+    def __init__(self, model, path):
+        self.model = model
+        self.path = path
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        response = self.model.generate_content(prompt, **kwargs)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"prompt": prompt, "response": response.text}) + "\n")
+        return response
+
+
+def load_recorded(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line)["response"] for line in f if line.strip()]
+
+
+class CpuMeter:
+    """Accumulates per-thread CPU self time spent inside wrapped functions"""
+
+    def __init__(self):
+        self.seconds = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def wrap(self, name, func):
+        def wrapper(*args, **kwargs):
+            stack = self._local.__dict__.setdefault('stack', [])
+            stack.append(0.0)
+            start = time.thread_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.thread_time() - start
+                # Time of wrapped calls nested inside this one is counted under their own name
+                own = elapsed - stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                with self._lock:
+                    self.seconds[name] = self.seconds.get(name, 0.0) + own
+        return wrapper
+
+
+class ParseFailureCounter(logging.Handler):
+    """Counts the server's 'Failed to parse' errors"""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.count = 0
+        self._counter_lock = threading.Lock()
+
+    def emit(self, record):
+        if 'Failed to parse' in str(record.msg):
+            with self._counter_lock:
+                self.count += 1
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def build_requests(count, unique_dates, round_trip_share, seed):
+    rng = random.Random(seed)
+    routes = [("BER", "DEL"), ("FRA", "BOM"), ("MUC", "BLR"), ("HAM", "MAA"), ("DUS", "HYD")]
+    start = date.today() + timedelta(days=30)
+    requests = []
+    for i in range(count):
+        departure, arrival = rng.choice(routes)
+        offset = i if unique_dates else rng.randint(0, 6)
+        departure_date = start + timedelta(days=offset)
+        params = {"departure": departure, "arrival": arrival,
+                  "departureDate": departure_date.isoformat(), "passengers": rng.randint(1, 3)}
+        if rng.random() < round_trip_share:
+            params["returnDate"] = (departure_date + timedelta(days=rng.randint(5, 20))).isoformat()
+        requests.append(params)
+    return requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--latency-ms', type=float, default=500.0, help='mean injected model latency')
+    parser.add_argument('--jitter-ms', type=float, default=150.0)
+    parser.add_argument('--malformed-rate', type=float, default=0.05, help='share of malformed model responses')
+    parser.add_argument('--round-trip-share', type=float, default=0.3)
+    parser.add_argument('--unique-dates', action='store_true', help='make every request a cache miss')
+    parser.add_argument('--replay', help='JSONL of recorded responses to replay')
+    parser.add_argument('--record', help='call the real model and record responses to this JSONL file')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--log-file', default=os.path.join(tempfile.gettempdir(), 'flight_bench.log'),
+                        help='where server logging goes during the run')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    # Configure logging before the server does, so the run does not write to flight_search.log
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                        handlers=[logging.FileHandler(args.log_file, encoding='utf-8')])
+    os.environ.setdefault('PREFETCH_ENABLED', '0')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import_start = time.perf_counter()
+    import flight_server
+    import_seconds = time.perf_counter() - import_start
+
+    if args.record:
+        model = RecordingModel(flight_server.get_model(), args.record)
+    else:
+        responses = load_recorded(args.replay) if args.replay else None
+        model = ReplayModel(responses, args.latency_ms, args.jitter_ms, args.malformed_rate, args.seed)
+    flight_server.get_model = lambda: model
+
+    # Count mock fallbacks and CPU spent in our own parsing/ranking and logging
+    meter = CpuMeter()
+    fallbacks = {"count": 0, "upstream": 0}
+    fallback_lock = threading.Lock()
+    fetch = flight_server.fetch_flight_options
+
+    def counting_fetch(params, **kwargs):
+        options, cacheable = fetch(params, **kwargs)
+        with fallback_lock:
+            fallbacks["upstream"] += 1
+            if not cacheable:
+                fallbacks["count"] += 1
+        return options, cacheable
+
+    parse_failures = ParseFailureCounter()
+    flight_server.logger.addHandler(parse_failures)
+
+    flight_server.fetch_flight_options = meter.wrap('response_parsing', counting_fetch)
+    flight_server.parse_flight_options = meter.wrap('record_parsing', flight_server.parse_flight_options)
+    flight_server.build_search_response = meter.wrap('ranking_analysis', flight_server.build_search_response)
+    flight_server.logger.handle = meter.wrap('logging', flight_server.logger.handle)
+
+    workload = build_requests(args.requests, args.unique_dates, args.round_trip_share, args.seed)
+    latencies = []
+    statuses = {}
+    request_cpu = []
+    lock = threading.Lock()
+
+    def run(params):
+        client = flight_server.app.test_client()
+        cpu_start = time.thread_time()
+        start = time.perf_counter()
+        response = client.post('/api/search-flights', json=params)
+        elapsed = time.perf_counter() - start
+        cpu = time.thread_time() - cpu_start
+        with lock:
+            latencies.append(elapsed)
+            request_cpu.append(cpu)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(run, workload))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    upstream = fallbacks["upstream"]
+    report = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(args.requests / wall, 2) if wall else None,
+        "status_codes": statuses,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p90": round(percentile(latencies, 90) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+            "mean": round(statistics.mean(latencies) * 1000, 2) if latencies else 0.0
+        },
+        "upstream_calls": upstream,
+        "cache": flight_server.search_cache.stats(),
+        "parse_failure_rate": round(parse_failures.count / upstream, 4) if upstream else 0.0,
+        "malformed_injected": getattr(model, 'malformed_served', None),
+        "mock_fallback_rate": round(fallbacks["count"] / upstream, 4) if upstream else 0.0,
+        "cpu_ms": {
+            "per_request_mean": round(statistics.mean(request_cpu) * 1000, 3) if request_cpu else 0.0,
+            **{name: round(seconds * 1000, 2) for name, seconds in sorted(meter.seconds.items())}
+        },
+        "server_import_ms": round(import_seconds * 1000, 1)
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"Requests: {report['requests']} at concurrency {report['concurrency']} "
+          f"in {report['wall_seconds']}s ({report['throughput_rps']} req/s), statuses {statuses}")
+    print(f"Latency ms: p50 {report['latency_ms']['p50']}  p90 {report['latency_ms']['p90']}  "
+          f"p99 {report['latency_ms']['p99']}  max {report['latency_ms']['max']}")
+    print(f"Upstream calls: {upstream}  cache: {report['cache']}")
+    print(f"Parse failure rate: {report['parse_failure_rate']:.2%}  mock fallback rate: {report['mock_fallback_rate']:.2%}")
+    print(f"CPU ms: {report['cpu_ms']}")
+    print(f"Server import: {report['server_import_ms']} ms")
+
+
+if __name__ == '__main__':
+    main()
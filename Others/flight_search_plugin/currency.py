@@ -0,0 +1,96 @@
+import copy
+import json
+import os
+import threading
+
+# Currencies quoted without minor units (amounts are whole numbers)
+ZERO_DECIMAL_CURRENCIES = {'JPY', 'KRW', 'HUF'}
+
+DEFAULT_FX_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fx_rates.json')
+
+
+def minor_units(amount, currency):
+    """Integer amount in minor units (cents, paise, ...) for exact comparisons"""
+    if amount != amount:
+        return None
+    return int(round(amount if currency in ZERO_DECIMAL_CURRENCIES else amount * 100))
+
+
+class FxTable:
+    """FX rate table loaded from a local JSON file, reloaded when the file changes.
+
+    The file holds units of each currency per one unit of `base`, so the
+    server can normalize prices with no network access.
+    """
+
+    def __init__(self, path=DEFAULT_FX_FILE):
+        self.path = path
+        self.base = 'EUR'
+        self.rates = {'EUR': 1.0}
+        self.updated = None
+        self._mtime = None
+        self._lock = threading.Lock()
+        self.reload_if_changed()
+
+    def reload_if_changed(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        with open(self.path, encoding='utf-8') as f:
+            table = json.load(f)
+        with self._lock:
+            self.base = table.get('base', 'EUR').upper()
+            self.rates = {code.upper(): float(rate) for code, rate in table['rates'].items()}
+            self.rates[self.base] = 1.0
+            self.updated = table.get('updated')
+            self._mtime = mtime
+        return True
+
+    def supports(self, currency):
+        return str(currency or '').upper() in self.rates
+
+    def convert(self, amount, from_currency, to_currency):
+        """Convert amount between currencies; NaN if either currency is unknown"""
+        from_currency = from_currency.upper()
+        to_currency = to_currency.upper()
+        if from_currency == to_currency:
+            return amount
+        rates = self.rates
+        if from_currency not in rates or to_currency not in rates:
+            return float('nan')
+        return amount / rates[from_currency] * rates[to_currency]
+
+
+def normalize_option(option, currency, fx, assumed_currency=None):
+    """Copy of a FlightOption with its price converted to `currency`.
+
+    The original amount and currency are kept on the copy; prices without a
+    currency label are taken to be in `assumed_currency`.
+    """
+    source_currency = option.original_currency or assumed_currency or currency
+    if option.currency == currency and not option.legs:
+        return option
+    normalized = copy.copy(option)
+    if option.legs:
+        # Round trips are re-summed from their normalized legs
+        legs = tuple(normalize_option(leg, currency, fx, assumed_currency) for leg in option.legs)
+        normalized.legs = legs
+        normalized.price = legs[0].price + legs[1].price
+    else:
+        normalized.price = fx.convert(option.original_price, source_currency, currency)
+    if normalized.price == normalized.price:
+        # Round to whole minor units so equal prices compare equal
+        scale = 1 if currency in ZERO_DECIMAL_CURRENCIES else 100
+        normalized.price = round(normalized.price * scale) / scale
+    normalized.currency = currency
+    return normalized
+
+
+def normalize_options(options, currency, fx, assumed_currency=None):
+    """Convert every option's price to `currency` (inputs are not modified)"""
+    fx.reload_if_changed()
+    currency = currency.upper()
+    return [normalize_option(option, currency, fx, assumed_currency) for option in options]
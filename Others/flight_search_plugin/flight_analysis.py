@@ -0,0 +1,148 @@
+import numpy as np
+
+from flight_records import DEFAULT_WEIGHTS, FlightTable, format_price
+
+# Rows compared at once when checking dominance; bounds memory to CHUNK x n x 3
+PARETO_CHUNK = 256
+
+
+def format_duration(minutes):
+    """Format minutes as 'Xh Ym'"""
+    minutes = int(round(minutes))
+    return f"{minutes // 60}h {minutes % 60}m"
+
+
+def objective_matrix(table):
+    """(n, 3) matrix of price, duration and stops where unknown values are +inf"""
+    stops = np.where(table.stops < 0, np.inf, table.stops).astype(np.float64)
+    matrix = np.column_stack((table.price, table.duration, stops))
+    matrix[np.isnan(matrix)] = np.inf
+    return matrix
+
+
+def pareto_frontier(table):
+    """Row indices of options not dominated on price, duration and stops, cheapest first"""
+    matrix = objective_matrix(table)
+    count = len(matrix)
+    dominated = np.zeros(count, dtype=bool)
+    for start in range(0, count, PARETO_CHUNK):
+        rows = matrix[start:start + PARETO_CHUNK, None, :]
+        # Row i is dominated if some j is no worse everywhere and strictly better somewhere
+        no_worse = (matrix[None, :, :] <= rows).all(axis=2)
+        better = (matrix[None, :, :] < rows).any(axis=2)
+        dominated[start:start + PARETO_CHUNK] = (no_worse & better).any(axis=1)
+    frontier = np.flatnonzero(~dominated)
+    return frontier[np.lexsort((matrix[frontier, 1], matrix[frontier, 0]))]
+
+
+def _pick(column, scores):
+    """Index of the smallest known value in a column, ties broken by ranking score"""
+    known = np.flatnonzero(~np.isnan(column))
+    if not len(known):
+        return None
+    order = np.lexsort((scores[known], column[known]))
+    return int(known[order[0]])
+
+
+def analyze_flights(options, weights=DEFAULT_WEIGHTS):
+    """Analyze flight options locally; returns a dict in the system prompt's analysis format"""
+    table = options if isinstance(options, FlightTable) else FlightTable(options)
+    if not len(table):
+        return {
+            "type": "analysis",
+            "reasoning_type": "comparative_analysis",
+            "content": "No flight options to analyze",
+            "metrics": {"price_range": "N/A", "avg_duration": "N/A", "direct_options": "0", "best_value": "N/A"},
+            "picks": {},
+            "pareto_frontier": [],
+            "validation": {"data_complete": False, "sources_verified": False, "notes": "Empty result set"}
+        }
+
+    frontier = pareto_frontier(table)
+    scores = table.scores(weights)
+    best_value = int(frontier[np.argmin(scores[frontier])])
+    cheapest = _pick(table.price, scores)
+    fastest = _pick(table.duration, scores)
+
+    known_price = table.price[~np.isnan(table.price)]
+    known_duration = table.duration[~np.isnan(table.duration)]
+    currencies = sorted({o.currency for o in table.options if o.currency})
+    currency = currencies[0] if len(currencies) == 1 else ''
+    price_range = (f"{format_price(known_price.min(), currency)}-{format_price(known_price.max(), currency)}"
+                   if len(known_price) else "N/A")
+    direct_options = int((table.stops == 0).sum())
+
+    picks = {}
+    for label, index in (("cheapest", cheapest), ("fastest", fastest), ("best_value", best_value)):
+        if index is not None:
+            picks[label] = table.options[index].to_dict()
+
+    notes = f"{len(frontier)} of {len(table)} options are Pareto-optimal on price, duration and stops"
+    if len(currencies) > 1:
+        notes += f"; prices are in mixed currencies ({', '.join(currencies)})"
+    return {
+        "type": "analysis",
+        "reasoning_type": "comparative_analysis",
+        "content": (f"Compared {len(table)} options: cheapest is {table.options[cheapest].airline if cheapest is not None else 'N/A'}, "
+                    f"fastest is {table.options[fastest].airline if fastest is not None else 'N/A'}, "
+                    f"best value is {table.options[best_value].airline}"),
+        "metrics": {
+            "price_range": price_range,
+            "avg_duration": format_duration(known_duration.mean()) if len(known_duration) else "N/A",
+            "direct_options": str(direct_options),
+            "best_value": table.options[best_value].airline
+        },
+        "picks": picks,
+        "pareto_frontier": [table.options[i].to_dict() for i in frontier],
+        "validation": {
+            "data_complete": bool(len(known_price) == len(table) and len(known_duration) == len(table)),
+            "sources_verified": False,
+            "notes": notes
+        }
+    }
+
+
+REASONS = {
+    "cheapest": "Lowest price among all options",
+    "fastest": "Shortest total travel time among all options",
+    "best_value": "Best balance of price, travel time and stops on the Pareto frontier"
+}
+
+
+def recommend_flights(analysis):
+    """Turn an analysis dict into recommendation entries, one per distinct pick"""
+    recommendations = []
+    seen = {}
+    for label in ("best_value", "cheapest", "fastest"):
+        flight = analysis.get("picks", {}).get(label)
+        if not flight:
+            continue
+        key = (flight["airline"], flight["price"], flight["departureTime"])
+        if key in seen:
+            # Same flight wins several categories; fold the reasons together
+            seen[key]["reasoning"] += f"; {REASONS[label].lower()}"
+            seen[key]["categories"].append(label)
+            continue
+        recommendation = {
+            "type": "recommendation",
+            "reasoning_type": "decision_making",
+            "content": f"{label.replace('_', ' ').title()}: {flight['airline']} for {flight['price']}",
+            "categories": [label],
+            "flight_details": {
+                "airline": flight["airline"],
+                "price": flight["price"],
+                "duration": flight["duration"],
+                "stops": flight["stops"],
+                "departure": flight["departureTime"],
+                "arrival": flight["arrivalTime"]
+            },
+            "reasoning": REASONS[label],
+            "validation": {
+                "criteria_met": True,
+                "alternatives_considered": True,
+                "notes": analysis.get("validation", {}).get("notes", "")
+            }
+        }
+        seen[key] = recommendation
+        recommendations.append(recommendation)
+    return recommendations
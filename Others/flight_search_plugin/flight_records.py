@@ -0,0 +1,333 @@
+import functools
+import re
+
+import numpy as np
+
+from currency import minor_units
+
+# Marker for numeric fields that could not be parsed from the provider text
+UNKNOWN = -1
+
+CURRENCY_SYMBOLS = {'€': 'EUR', '$': 'USD', '£': 'GBP', '₹': 'INR', '¥': 'JPY'}
+# ISO codes recognized next to a price; other three-letter words ('per', 'approx') are not currencies
+CURRENCY_CODES = frozenset({
+    'AED', 'AUD', 'BDT', 'BHD', 'BRL', 'CAD', 'CHF', 'CNY', 'CZK', 'DKK', 'EGP', 'EUR', 'GBP', 'HKD',
+    'HUF', 'IDR', 'ILS', 'INR', 'JPY', 'KES', 'KRW', 'KWD', 'LKR', 'MXN', 'MYR', 'NGN', 'NOK', 'NPR',
+    'NZD', 'OMR', 'PHP', 'PKR', 'PLN', 'QAR', 'RON', 'SAR', 'SEK', 'SGD', 'THB', 'TRY', 'TWD', 'USD',
+    'VND', 'ZAR'
+})
+STOP_WORDS = {'one': 1, 'two': 2, 'three': 3, 'four': 4}
+
+_CODE = r'(?<![A-Za-z])(' + '|'.join(sorted(CURRENCY_CODES)) + r')(?![A-Za-z])'
+PRICE_RE = re.compile(r'(?:' + _CODE + r'|([€$£₹¥]))?\s*(\d[\d,]*(?:\.\d+)?)\s*(?:' + _CODE + r')?',
+                      re.IGNORECASE)
+HOURS_RE = re.compile(r'(\d+)\s*h', re.IGNORECASE)
+MINUTES_RE = re.compile(r'(\d+)\s*m', re.IGNORECASE)
+CLOCK_RE = re.compile(r'^\s*(\d{1,2}):(\d{2})\s*$')
+STOPS_RE = re.compile(r'(\d+|one|two|three|four)\s*(?:stop|layover)', re.IGNORECASE)
+DIRECT_RE = re.compile(r'non[\s-]?stop|direct', re.IGNORECASE)
+TIME_OF_DAY_RE = re.compile(r'(\d{1,2}):(\d{2})\s*([AaPp]\.?[Mm]\.?)?')
+
+# Default ranking weights for (price, duration, stops); lower score is better
+DEFAULT_WEIGHTS = (0.6, 0.3, 0.1)
+SORT_WEIGHTS = {
+    'best': DEFAULT_WEIGHTS,
+    'price': (1.0, 0.0001, 0.0),
+    'duration': (0.0001, 1.0, 0.0),
+    'stops': (0.0001, 0.0, 1.0)
+}
+
+
+def parser_cache(maxsize):
+    """functools.lru_cache for the text parsers; lists or dicts sent by the LLM parse like missing values"""
+    def decorator(func):
+        cached = functools.lru_cache(maxsize=maxsize)(func)
+
+        @functools.wraps(func)
+        def wrapper(text):
+            return cached(text if text is None or isinstance(text, (str, int, float)) else '')
+        wrapper.cache_info = cached.cache_info
+        wrapper.cache_clear = cached.cache_clear
+        return wrapper
+    return decorator
+
+
+def display_text(value, default='N/A'):
+    """A provider display field as text; the LLM sometimes sends dicts or lists instead of strings"""
+    if value is None:
+        return default
+    if isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, dict):
+        value = value.values()
+    if isinstance(value, (list, tuple, type({}.values()))):
+        # {"amount": 45000, "currency": "INR"} -> '45000 INR', which parse_price still understands
+        text = ' '.join(str(part) for part in (display_text(item, '') for item in value) if part != '')
+        return text or default
+    return str(value)
+
+
+def format_price(amount, currency):
+    """Format an amount like the providers do, e.g. 'INR 45,000'"""
+    text = f"{amount:,.0f}" if float(amount).is_integer() else f"{amount:,.2f}"
+    return f"{currency} {text}".strip()
+
+
+@parser_cache(maxsize=4096)
+def parse_price(text):
+    """Parse 'INR 45,000' / '€512' / '512 EUR' into (amount, currency); amount is NaN if missing"""
+    if isinstance(text, (int, float)):
+        return float(text), ''
+    match = PRICE_RE.search(text or '')
+    if not match:
+        return float('nan'), ''
+    code, symbol, amount, suffix = match.groups()
+    currency = code or CURRENCY_SYMBOLS.get(symbol) or suffix or ''
+    return float(amount.replace(',', '')), currency.upper()
+
+
+@parser_cache(maxsize=4096)
+def parse_duration(text):
+    """Parse '9h 30m' / '9:30' into minutes, or UNKNOWN"""
+    text = str(text or '')
+    clock = CLOCK_RE.match(text)
+    if clock:
+        return int(clock.group(1)) * 60 + int(clock.group(2))
+    hours = HOURS_RE.search(text)
+    minutes = MINUTES_RE.search(text)
+    if not hours and not minutes:
+        return UNKNOWN
+    return (int(hours.group(1)) * 60 if hours else 0) + (int(minutes.group(1)) if minutes else 0)
+
+
+@parser_cache(maxsize=4096)
+def parse_time_of_day(text):
+    """Parse '2:30 PM' / '14:30' / '6:00 AM (next day)' into minutes after midnight, or UNKNOWN"""
+    match = TIME_OF_DAY_RE.search(str(text or ''))
+    if not match:
+        return UNKNOWN
+    hours, minutes = int(match.group(1)), int(match.group(2))
+    meridiem = (match.group(3) or '').lower()
+    if meridiem:
+        hours = hours % 12 + (12 if meridiem.startswith('p') else 0)
+    if hours > 23 or minutes > 59:
+        return UNKNOWN
+    return hours * 60 + minutes
+
+
+@parser_cache(maxsize=1024)
+def parse_stops(text):
+    """Parse 'Non-stop' / '1 stop in Dubai' / 2 into a stop count, or UNKNOWN"""
+    if isinstance(text, int):
+        return text
+    text = str(text or '')
+    if DIRECT_RE.search(text):
+        return 0
+    match = STOPS_RE.search(text)
+    if not match:
+        return UNKNOWN
+    count = match.group(1).lower()
+    return STOP_WORDS[count] if count in STOP_WORDS else int(count)
+
+
+class FlightOption:
+    """One flight option with normalized numeric fields next to the original display strings"""
+
+    __slots__ = ('airline', 'price', 'currency', 'duration_minutes', 'stops',
+                 'departure_time', 'arrival_time', 'source', 'recommendation',
+                 'price_text', 'duration_text', 'stops_text', 'legs',
+                 'original_price', 'original_currency')
+
+    def __init__(self, airline, price, currency, duration_minutes, stops,
+                 departure_time='N/A', arrival_time='N/A', source='N/A', recommendation='N/A',
+                 price_text='N/A', duration_text='N/A', stops_text='N/A', legs=None,
+                 original_price=None, original_currency=None):
+        self.airline = airline
+        self.price = price
+        self.currency = currency
+        self.duration_minutes = duration_minutes
+        self.stops = stops
+        self.departure_time = departure_time
+        self.arrival_time = arrival_time
+        self.source = source
+        self.recommendation = recommendation
+        self.price_text = price_text
+        self.duration_text = duration_text
+        self.stops_text = stops_text
+        self.legs = legs
+        # Price as quoted by the provider; `price`/`currency` may be converted later
+        self.original_price = price if original_price is None else original_price
+        self.original_currency = currency if original_currency is None else original_currency
+
+    @classmethod
+    def from_dict(cls, flight):
+        """Build a record from an LLM/provider flight dict"""
+        price_text = display_text(flight.get('price'))
+        duration_text = display_text(flight.get('duration'))
+        stops_text = display_text(flight.get('stops'))
+        price, currency = parse_price(price_text)
+        return cls(
+            airline=display_text(flight.get('airline'), 'Unknown'),
+            price=price,
+            currency=currency,
+            duration_minutes=parse_duration(duration_text),
+            stops=parse_stops(stops_text),
+            departure_time=display_text(flight.get('departureTime')),
+            arrival_time=display_text(flight.get('arrivalTime')),
+            source=display_text(flight.get('source')),
+            recommendation=display_text(flight.get('recommendation')),
+            price_text=price_text,
+            duration_text=duration_text,
+            stops_text=stops_text
+        )
+
+    @classmethod
+    def round_trip(cls, outbound, inbound):
+        """Combine an outbound and a return option into one round-trip option"""
+        same_currency = outbound.currency == inbound.currency
+        price = outbound.price + inbound.price if same_currency else float('nan')
+        known_duration = outbound.duration_minutes != UNKNOWN and inbound.duration_minutes != UNKNOWN
+        known_stops = outbound.stops != UNKNOWN and inbound.stops != UNKNOWN
+        airline = (outbound.airline if outbound.airline == inbound.airline
+                   else f"{outbound.airline} / {inbound.airline}")
+        return cls(
+            airline=airline,
+            price=price,
+            currency=outbound.currency if same_currency else '',
+            duration_minutes=outbound.duration_minutes + inbound.duration_minutes if known_duration else UNKNOWN,
+            stops=outbound.stops + inbound.stops if known_stops else UNKNOWN,
+            departure_time=outbound.departure_time,
+            arrival_time=outbound.arrival_time,
+            source=outbound.source if outbound.source == inbound.source else f"{outbound.source} / {inbound.source}",
+            recommendation=f"Outbound: {outbound.recommendation}; Return: {inbound.recommendation}",
+            price_text=(format_price(price, outbound.currency) if same_currency and price == price
+                        else f"{outbound.price_text} + {inbound.price_text}"),
+            duration_text=f"{outbound.duration_text} + {inbound.duration_text}",
+            stops_text=f"Outbound: {outbound.stops_text}, Return: {inbound.stops_text}",
+            legs=(outbound, inbound)
+        )
+
+    def to_dict(self):
+        """Client-facing dict: the original display fields plus the normalized values"""
+        # Show the stored price when it no longer matches the quote (converted or rescaled)
+        converted = (self.currency != self.original_currency or self.price != self.original_price) and self.price == self.price
+        flight = {
+            "airline": self.airline,
+            "price": format_price(self.price, self.currency) if converted else self.price_text,
+            "departureTime": self.departure_time,
+            "arrivalTime": self.arrival_time,
+            "duration": self.duration_text,
+            "stops": self.stops_text,
+            "source": self.source,
+            "recommendation": self.recommendation,
+            "priceValue": None if self.price != self.price else self.price,
+            "currency": self.currency,
+            "durationMinutes": None if self.duration_minutes == UNKNOWN else self.duration_minutes,
+            "stopCount": None if self.stops == UNKNOWN else self.stops,
+            "originalPrice": self.price_text,
+            "originalCurrency": self.original_currency
+        }
+        if self.legs:
+            flight["legs"] = [leg.to_dict() for leg in self.legs]
+        return flight
+
+    def __repr__(self):
+        return (f"FlightOption({self.airline!r}, {self.currency} {self.price}, "
+                f"{self.duration_minutes}min, {self.stops} stops)")
+
+
+def combine_round_trips(outbound_options, return_options, limit=10):
+    """Pair the best `limit` options of each leg into round-trip options"""
+    outbound = FlightTable(outbound_options).top(limit=limit)
+    inbound = FlightTable(return_options).top(limit=limit)
+    return [FlightOption.round_trip(out, back) for out in outbound for back in inbound]
+
+
+def dedupe_options(options):
+    """Drop repeated options (same airline, times and price in minor units), keeping the first"""
+    seen = set()
+    unique = []
+    for option in options:
+        key = (str(option.airline).lower(), option.departure_time, option.arrival_time, option.currency,
+               minor_units(option.price, option.currency))
+        if key not in seen:
+            seen.add(key)
+            unique.append(option)
+    return unique
+
+
+def parse_flight_options(flights):
+    """Parse a list of flight dicts into FlightOption records, skipping non-dict entries"""
+    return [FlightOption.from_dict(flight) for flight in flights if isinstance(flight, dict)]
+
+
+class FlightTable:
+    """Columnar view over a list of FlightOption records for vectorized filtering and ranking"""
+
+    def __init__(self, options):
+        self.options = list(options)
+        count = len(self.options)
+        self.price = np.fromiter((o.price for o in self.options), dtype=np.float64, count=count)
+        self.duration = np.fromiter((o.duration_minutes for o in self.options), dtype=np.float64, count=count)
+        self.stops = np.fromiter((o.stops for o in self.options), dtype=np.int16, count=count)
+        self.airline = np.array([str(o.airline).lower() for o in self.options], dtype=object)
+        self.departure = np.fromiter((parse_time_of_day(o.departure_time) for o in self.options),
+                                     dtype=np.float64, count=count)
+        # Unknown durations and times become NaN so they never win a comparison
+        self.duration[self.duration == UNKNOWN] = np.nan
+        self.departure[self.departure == UNKNOWN] = np.nan
+
+    def __len__(self):
+        return len(self.options)
+
+    def mask(self, max_price=None, max_stops=None, max_duration=None, airlines=None,
+             depart_after=None, depart_before=None):
+        """Boolean mask of rows matching all given filters.
+
+        depart_after/depart_before are minutes after midnight; a window such as
+        22:00-02:00 wraps past midnight.
+        """
+        keep = np.ones(len(self.options), dtype=bool)
+        if max_price is not None:
+            keep &= self.price <= float(max_price)
+        if max_stops is not None:
+            keep &= (self.stops >= 0) & (self.stops <= int(max_stops))
+        if max_duration is not None:
+            keep &= self.duration <= float(max_duration)
+        if airlines:
+            keep &= np.isin(self.airline, [a.lower() for a in airlines])
+        if depart_after is not None or depart_before is not None:
+            after = self.departure >= (depart_after if depart_after is not None else 0)
+            before = self.departure <= (depart_before if depart_before is not None else 24 * 60)
+            wraps = depart_after is not None and depart_before is not None and depart_after > depart_before
+            keep &= (after | before) if wraps else (after & before)
+        return keep
+
+    def scores(self, weights=DEFAULT_WEIGHTS):
+        """Weighted sum of min-max normalized price, duration and stops; unknown values score worst"""
+        columns = (self.price, self.duration, np.where(self.stops < 0, np.nan, self.stops).astype(np.float64))
+        total = np.zeros(len(self.options), dtype=np.float64)
+        for weight, column in zip(weights, columns):
+            if not weight or not len(column):
+                continue
+            known = ~np.isnan(column)
+            if not known.any():
+                continue
+            low, high = column[known].min(), column[known].max()
+            span = high - low if high > low else 1.0
+            total += weight * np.where(known, (column - low) / span, 1.0)
+        return total
+
+    def rank(self, weights=DEFAULT_WEIGHTS, limit=None, **filters):
+        """Row indices of matching options, best score first"""
+        rows = np.flatnonzero(self.mask(**filters))
+        scores = self.scores(weights)[rows]
+        if limit is not None and limit < len(rows):
+            # Only the top `limit` rows need a full sort
+            top = np.argpartition(scores, limit)[:limit]
+            return rows[top[np.argsort(scores[top], kind='stable')]]
+        return rows[np.argsort(scores, kind='stable')]
+
+    def top(self, weights=DEFAULT_WEIGHTS, limit=None, **filters):
+        """Matching FlightOption records, best score first"""
+        return [self.options[i] for i in self.rank(weights, limit, **filters)]
@@ -1,12 +1,26 @@
+import time
+STARTUP_BEGAN = time.perf_counter()
+
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import requests
 import os
 from dotenv import load_dotenv
 import logging
 import json
-from datetime import datetime
-import google.generativeai as genai
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from airports import build_airport_index, is_place_name
+from currency import DEFAULT_FX_FILE, FxTable, normalize_options
+from flight_analysis import analyze_flights, recommend_flights
+from flight_records import (DEFAULT_WEIGHTS, SORT_WEIGHTS, FlightTable, combine_round_trips, dedupe_options,
+                            parse_flight_options, parse_time_of_day)
+from prefetch import PrefetchScheduler
+from result_sets import SORT_KEYS
+from search_cache import SearchCache, search_key
+from sessions import SessionStore, scale_prices
+from upstream import Cancelled, DeadlineExceeded, Overloaded, UpstreamPool, submit_in_context
 
 # Load environment variables
 load_dotenv()
@@ -25,12 +39,76 @@ logger = logging.getLogger("flight_search")
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Configure Gemini API
+# Gemini API key; the SDK itself is imported and configured on first model use
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-genai.configure(api_key=GEMINI_API_KEY)
+# Build the model in a background thread when the dev server starts instead of on the first search
+MODEL_WARMUP = os.getenv('GEMINI_MODEL_WARMUP', '1') == '1'
+
+# Seconds to keep the static prompt as explicit cached context (0 = use system instruction only);
+# shorter TTLs are raised to MIN_PROMPT_CACHE_TTL so the prefix is not re-uploaded on every search
+MIN_PROMPT_CACHE_TTL = 300
+PROMPT_CACHE_TTL = int(os.getenv('GEMINI_PROMPT_CACHE_TTL', '0'))
+if PROMPT_CACHE_TTL > 0:
+    PROMPT_CACHE_TTL = max(PROMPT_CACHE_TTL, MIN_PROMPT_CACHE_TTL)
+PROMPT_CACHE_MODEL = os.getenv('GEMINI_PROMPT_CACHE_MODEL', 'models/gemini-2.0-flash-001')
+
+# Airport index for autocomplete and local parameter validation
+airport_index = build_airport_index()
+if not airport_index.complete:
+    logger.warning("airports.csv not found; using the partial built-in airport table, so unknown airports "
+                   "are passed to the model (run `python airports.py --update` to restore it)")
+MAX_PASSENGERS = 9
+
+# Prices are normalized to the requested currency (or DEFAULT_CURRENCY) with a
+# local FX table; unlabeled provider prices are assumed to be in DEFAULT_CURRENCY
+DEFAULT_CURRENCY = os.getenv('DEFAULT_CURRENCY', 'INR').upper()
+fx_table = FxTable(os.getenv('FX_RATES_FILE', DEFAULT_FX_FILE))
 
-# Initialize the model
-model = genai.GenerativeModel('gemini-2.0-flash')
+# Search result cache shared by all endpoints
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', '900'))
+search_cache = SearchCache(ttl_seconds=SEARCH_CACHE_TTL)
+
+# Background refresh of hot routes: how many to track, how often to check,
+# how long before expiry to refresh and the upstream call budget per minute
+PREFETCH_ENABLED = os.getenv('PREFETCH_ENABLED', '1') == '1'
+PREFETCH_TOP_K = int(os.getenv('PREFETCH_TOP_K', '20'))
+PREFETCH_INTERVAL = float(os.getenv('PREFETCH_INTERVAL', '30'))
+PREFETCH_REFRESH_AHEAD = float(os.getenv('PREFETCH_REFRESH_AHEAD', '120'))
+PREFETCH_MAX_PER_MINUTE = int(os.getenv('PREFETCH_MAX_PER_MINUTE', '6'))
+
+# Multi-turn sessions: idle timeout, count and memory caps
+session_store = SessionStore(
+    ttl_seconds=int(os.getenv('SESSION_TTL', '1800')),
+    max_sessions=int(os.getenv('SESSION_MAX_COUNT', '1000')),
+    max_bytes=int(os.getenv('SESSION_MAX_MB', '64')) * 1024 * 1024
+)
+
+# Stored result sets for server-side paging/sort/filter: idle timeout, count and memory caps, page sizes
+result_store = SessionStore(
+    ttl_seconds=int(os.getenv('RESULT_SET_TTL', '1800')),
+    max_sessions=int(os.getenv('RESULT_SET_MAX_COUNT', '2000')),
+    max_bytes=int(os.getenv('RESULT_SET_MAX_MB', '64')) * 1024 * 1024
+)
+DEFAULT_PAGE_SIZE = int(os.getenv('RESULT_PAGE_SIZE', '20'))
+MAX_PAGE_SIZE = 100
+
+# Upstream execution: concurrent model calls, extra queued calls before 503,
+# overall request deadline and per-call HTTP timeout (seconds)
+UPSTREAM_WORKERS = int(os.getenv('UPSTREAM_WORKERS', '4'))
+UPSTREAM_QUEUE_SIZE = int(os.getenv('UPSTREAM_QUEUE_SIZE', '16'))
+REQUEST_TIMEOUT = float(os.getenv('REQUEST_TIMEOUT', '45'))
+UPSTREAM_CALL_TIMEOUT = float(os.getenv('UPSTREAM_CALL_TIMEOUT', '30'))
+upstream_pool = UpstreamPool(workers=UPSTREAM_WORKERS, queue_size=UPSTREAM_QUEUE_SIZE,
+                             default_timeout=REQUEST_TIMEOUT)
+
+# Round trips: return legs run on their own pool; best options per leg that get paired
+ROUND_TRIP_LEG_LIMIT = int(os.getenv('ROUND_TRIP_LEG_LIMIT', '10'))
+leg_executor = ThreadPoolExecutor(max_workers=int(os.getenv('LEG_SEARCH_CONCURRENCY', '8')), thread_name_prefix='leg-search')
+
+# Flexible-date searches: widest allowed window (+/- days) and parallel upstream calls
+FLEX_MAX_DAYS = int(os.getenv('FLEX_MAX_DAYS', '3'))
+FLEX_SEARCH_CONCURRENCY = int(os.getenv('FLEX_SEARCH_CONCURRENCY', '4'))
+flex_executor = ThreadPoolExecutor(max_workers=FLEX_SEARCH_CONCURRENCY, thread_name_prefix='flex-search')
 
 # Define available tools/functions
 tools_description = """
@@ -42,17 +120,13 @@ Available tools:
 - recommend_flights(analysis: dict) -> list: Recommend best flight options based on analysis
 """
 
-def get_system_prompt(params):
-    departure = params.get('departure', '')
-    arrival = params.get('arrival', '')
-    departure_date = params.get('departureDate', '')
-    return_date = params.get('returnDate', '')
-    passengers = params.get('passengers', 1)
-
-    system_prompt = f"""You are a flight search expert with access to multiple flight search APIs. Your task is to:
+# Static part of the system prompt. Only the route, dates and passenger count
+# change between searches, so the prefix is built once at import time and
+# registered with the model instead of being re-sent inside every request.
+STATIC_SYSTEM_PROMPT = f"""You are a flight search expert with access to multiple flight search APIs. Your task is to:
 
-1. Search for flights from {departure} to {arrival} on {departure_date}{f' with return on {return_date}' if return_date else ''}
-2. Consider {passengers} passenger(s)
+1. Search for flights on the route and dates given in the search request
+2. Consider the number of passengers given in the search request
 3. Analyze the results based on:
    - Price competitiveness (compare with historical averages and other options)
    - Flight duration and layovers (prefer shorter total travel time)
@@ -196,9 +270,398 @@ IMPORTANT RULES:
 6. For return flights, ensure the return journey is also analyzed
 7. Consider time zone differences when calculating total travel time
 8. Always include validation and reasoning_type in responses
-9. Support multi-turn conversations by maintaining context"""
+9. Support multi-turn conversations by maintaining context
+
+OUTPUT FORMAT:
+IMPORTANT: You must respond with ONLY a valid JSON object in the following format:
+{{
+    "results": [
+        {{
+            "airline": "string",
+            "price": "string",
+            "departureTime": "string",
+            "arrivalTime": "string",
+            "duration": "string",
+            "stops": "string",
+            "source": "string",
+            "recommendation": "string"
+        }}
+    ]
+}}
+
+Do not include any additional text, explanations, or markdown formatting. Only the JSON object."""
+
+def get_request_prompt(params):
+    """Build the small per-request part of the prompt"""
+    departure = params.get('departure', '')
+    arrival = params.get('arrival', '')
+    departure_date = params.get('departureDate', '')
+    return_date = params.get('returnDate', '')
+    passengers = params.get('passengers', 1)
+
+    return f"""Please search for flights with the following details:
+- Departure: {departure}
+- Arrival: {arrival}
+- Departure Date: {departure_date}
+- Return Date: {return_date}
+- Passengers: {passengers}"""
+
+def create_model():
+    """Create the Gemini model with the static prompt registered as cached context or system instruction"""
+    # The SDK import dominates process start-up, so it is deferred until a model is needed
+    started = time.perf_counter()
+    import google.generativeai as genai
+    genai.configure(api_key=GEMINI_API_KEY)
+    logger.info(f"Gemini SDK loaded in {(time.perf_counter() - started) * 1000:.0f} ms")
+    if PROMPT_CACHE_TTL > 0:
+        try:
+            cached_prompt = genai.caching.CachedContent.create(
+                model=PROMPT_CACHE_MODEL,
+                display_name='flight-search-system-prompt',
+                system_instruction=STATIC_SYSTEM_PROMPT,
+                ttl=timedelta(seconds=PROMPT_CACHE_TTL)
+            )
+            logger.info(f"Static system prompt registered as cached content: {cached_prompt.name}")
+            # Refresh a little before the server-side cache expires (a minute, or a fifth of the TTL)
+            expires_at = datetime.now() + timedelta(seconds=PROMPT_CACHE_TTL - min(60, PROMPT_CACHE_TTL / 5))
+            return genai.GenerativeModel.from_cached_content(cached_content=cached_prompt), expires_at
+        except Exception as e:
+            # Explicit caching needs a minimum prompt size and a versioned model;
+            # the system instruction still avoids rebuilding the prompt per request
+            logger.warning(f"Context caching unavailable, using system instruction instead: {str(e)}")
+
+    return genai.GenerativeModel('gemini-2.0-flash', system_instruction=STATIC_SYSTEM_PROMPT), None
+
+def get_model():
+    """Return the shared model, creating it on first use and when its cached prompt has expired"""
+    global model, model_expires_at
+    current, expires_at = model, model_expires_at
+    if current is not None and not (expires_at and datetime.now() >= expires_at):
+        return current
+    with model_lock:
+        # Another thread may have built it while this one waited
+        if model is None or (model_expires_at and datetime.now() >= model_expires_at):
+            model, model_expires_at = create_model()
+        return model
+
+def warm_up_model():
+    """Build the model in a daemon thread so the first search does not pay for it"""
+    threading.Thread(target=get_model, name='model-warmup', daemon=True).start()
+
+# The model is created lazily by get_model()
+model = None
+model_expires_at = None
+model_lock = threading.Lock()
+
+def fetch_flight_options(params, background=False):
+    """Run one Gemini flight search; returns (FlightOption list, cacheable)"""
+    used_mock = False
+    
+    # Only the per-request part is sent; the static prefix lives on the model
+    logger.info("\nPreparing Gemini API request...")
+    prompt = get_request_prompt(params)
+
+    # Send request to Gemini API
+    logger.info("\nSending request to Gemini API...")
+    # Runs on the bounded upstream pool within the current request's deadline
+    response = upstream_pool.call(get_model().generate_content, prompt, background=background,
+                                  request_options={"timeout": UPSTREAM_CALL_TIMEOUT})
+    logger.info("\nRaw Gemini API Response:")
+    logger.info(response.text)
+
+    try:
+        # Clean and parse the response
+        logger.info("\nProcessing Gemini API response...")
+        response_text = response.text.strip()
+
+        # Remove any markdown formatting
+        response_text = response_text.replace('```json', '').replace('```', '')
+        response_text = response_text.strip()
+
+        # Find the JSON object in the response
+        start_idx = response_text.find('{')
+        end_idx = response_text.rfind('}') + 1
+        if start_idx >= 0 and end_idx > start_idx:
+            response_text = response_text[start_idx:end_idx]
+
+        logger.info("\nCleaned response text:")
+        logger.info(response_text)
+
+        # Parse the response
+        results = json.loads(response_text)
+
+        # Log the structure of the response
+        logger.info("\nResponse structure:")
+        logger.info(f"Type: {type(results)}")
+        logger.info(f"Keys: {results.keys() if isinstance(results, dict) else 'Not a dictionary'}")
+
+        # Validate the response structure
+        if not isinstance(results, dict):
+            raise ValueError("Response is not a dictionary")
+
+        # Check if the response has the expected structure
+        if "results" not in results:
+            # Try to find flight information in the response
+            flight_info = []
+            for key, value in results.items():
+                logger.info(f"\nChecking key: {key}")
+                logger.info(f"Value type: {type(value)}")
+
+                if isinstance(value, list):
+                    for item in value:
+                        if isinstance(item, dict):
+                            logger.info(f"Item keys: {item.keys()}")
+                            if any(field in item for field in ['airline', 'price', 'departureTime']):
+                                flight_info.append(item)
+
+            if flight_info:
+                logger.info(f"\nFound {len(flight_info)} flight options in alternative format")
+                results = {"results": flight_info}
+            else:
+                raise ValueError("Response missing 'results' key and no flight information found")
+
+        if not isinstance(results["results"], list):
+            raise ValueError("'results' is not a list")
+
+        # Validate each flight entry into a typed record
+        flight_options = parse_flight_options(results["results"])
+        results["results"] = [option.to_dict() for option in flight_options]
+
+        logger.info("\nSuccessfully parsed flight results:")
+        for flight in results["results"]:
+            logger.info(f"\nFlight Option:")
+            logger.info(f"Airline: {flight['airline']}")
+            logger.info(f"Price: {flight['price']}")
+            logger.info(f"Departure: {flight['departureTime']}")
+            logger.info(f"Arrival: {flight['arrivalTime']}")
+            logger.info(f"Duration: {flight['duration']}")
+            logger.info(f"Stops: {flight['stops']}")
+            logger.info(f"Source: {flight['source']}")
+            logger.info(f"Recommendation: {flight['recommendation']}")
+
+    except (json.JSONDecodeError, ValueError) as e:
+        used_mock = True
+        logger.error(f"\nFailed to parse Gemini API response: {str(e)}")
+        logger.error(f"Response that failed to parse: {response_text}")
+        logger.info("\nUsing mock data as fallback...")
+
+        # If parsing fails, use mock data
+        results = {
+            "results": [
+                {
+                    "airline": "Lufthansa",
+                    "price": "INR 45,000",
+                    "departureTime": "10:00 AM",
+                    "arrivalTime": "11:30 PM",
+                    "duration": "9h 30m",
+                    "stops": "Non-stop",
+                    "source": "Skyscanner",
+                    "recommendation": "Best direct flight option with good service"
+                },
+                {
+                    "airline": "Emirates",
+                    "price": "INR 42,500",
+                    "departureTime": "2:30 PM",
+                    "arrivalTime": "6:00 AM (next day)",
+                    "duration": "8h 30m",
+                    "stops": "1 stop in Dubai",
+                    "source": "Skyscanner",
+                    "recommendation": "Good value with short layover in Dubai"
+                }
+            ]
+        }
+        flight_options = parse_flight_options(results["results"])
+
+        logger.info("\nMock flight results:")
+        for flight in results["results"]:
+            logger.info(f"\nFlight Option:")
+            logger.info(f"Airline: {flight['airline']}")
+            logger.info(f"Price: {flight['price']}")
+            logger.info(f"Departure: {flight['departureTime']}")
+            logger.info(f"Arrival: {flight['arrivalTime']}")
+            logger.info(f"Duration: {flight['duration']}")
+            logger.info(f"Stops: {flight['stops']}")
+            logger.info(f"Source: {flight['source']}")
+            logger.info(f"Recommendation: {flight['recommendation']}")
+    
+    return flight_options, not used_mock
+
+def validate_search_params(params):
+    """Validate a search request locally before any upstream call; returns (normalized params, errors)"""
+    errors = []
+    normalized = dict(params)
+    for field in ('departure', 'arrival'):
+        value = str(params.get(field) or '').strip()
+        # Only a full airport dataset (airports.csv or AIRPORTS_CSV) is trusted to reject well-formed names
+        term, known = airport_index.resolve(value) if is_place_name(value) else (value, False)
+        if not known and (airport_index.complete or not is_place_name(value)):
+            errors.append({
+                "field": field,
+                "message": f"Unknown airport or city: '{value}'" if value else f"{field.capitalize()} is required",
+                "suggestions": [airport.to_dict() for airport in airport_index.autocomplete(value, limit=5)]
+            })
+        else:
+            if not known:
+                logger.warning(f"'{value}' is not in the airport index; searching it as given")
+            # Inputs that pin down one airport become its IATA code so equivalent inputs share cache entries
+            normalized[field] = term
+    if not errors and (normalized['departure'].upper() == normalized['arrival'].upper() or
+                       {id(a) for a in airport_index.lookup(normalized['departure'])} &
+                       {id(a) for a in airport_index.lookup(normalized['arrival'])}):
+        errors.append({"field": "arrival", "message": "Departure and arrival must be different"})
+    
+    try:
+        departure_date = datetime.strptime(params.get('departureDate', ''), '%Y-%m-%d').date()
+    except ValueError:
+        departure_date = None
+        errors.append({"field": "departureDate", "message": "Departure date must be YYYY-MM-DD"})
+    if params.get('returnDate'):
+        try:
+            return_date = datetime.strptime(params['returnDate'], '%Y-%m-%d').date()
+            if departure_date and return_date < departure_date:
+                errors.append({"field": "returnDate", "message": "Return date is before departure date"})
+        except ValueError:
+            errors.append({"field": "returnDate", "message": "Return date must be YYYY-MM-DD"})
+    
+    try:
+        passengers = int(params.get('passengers', 1))
+        if not 1 <= passengers <= MAX_PASSENGERS:
+            raise ValueError
+        normalized['passengers'] = passengers
+    except (TypeError, ValueError):
+        errors.append({"field": "passengers", "message": f"Passengers must be between 1 and {MAX_PASSENGERS}"})
+    
+    currency = str(params.get('currency') or DEFAULT_CURRENCY).upper()
+    if not fx_table.supports(currency):
+        errors.append({"field": "currency", "message": f"Unsupported currency: '{currency}'"})
+    normalized['currency'] = currency
+    
+    if params.get('pageSize') is not None:
+        try:
+            normalized['pageSize'] = min(max(int(params['pageSize']), 1), MAX_PAGE_SIZE)
+        except (TypeError, ValueError):
+            errors.append({"field": "pageSize", "message": "pageSize must be a number"})
+    
+    return normalized, errors
+
+def request_timeout(params):
+    """Request deadline in seconds: the client's timeoutMs, capped at REQUEST_TIMEOUT"""
+    try:
+        return min(float(params.get('timeoutMs', REQUEST_TIMEOUT * 1000)) / 1000, REQUEST_TIMEOUT)
+    except (TypeError, ValueError):
+        return REQUEST_TIMEOUT
+
+def upstream_error_response(error):
+    """503 when the upstream queue is full, 504 on deadline, 499 when the client cancelled"""
+    if isinstance(error, Overloaded):
+        logger.warning(f"Rejected search, upstream queue full: {upstream_pool.stats()}")
+        return jsonify({"error": "Flight search is busy, please retry shortly"}), 503, {"Retry-After": "2"}
+    if isinstance(error, Cancelled):
+        return jsonify({"error": "Request cancelled"}), 499
+    logger.warning("Search request exceeded its deadline")
+    return jsonify({"error": "Flight search timed out"}), 504
+
+def parse_result_filters(values):
+    """Filter kwargs for FlightTable.mask from request values (JSON body or query string)"""
+    filters = {}
+    if str(values.get('nonStop', '')).lower() in ('1', 'true'):
+        filters['max_stops'] = 0
+    elif values.get('maxStops') not in (None, ''):
+        filters['max_stops'] = int(values['maxStops'])
+    if values.get('maxPrice') not in (None, ''):
+        filters['max_price'] = float(values['maxPrice'])
+    if values.get('maxDurationMinutes') not in (None, ''):
+        filters['max_duration'] = float(values['maxDurationMinutes'])
+    airlines = values.get('airlines') or values.get('airline')
+    if airlines:
+        filters['airlines'] = [a.strip() for a in airlines.split(',')] if isinstance(airlines, str) else list(airlines)
+    for key, name in (('departAfter', 'depart_after'), ('departBefore', 'depart_before')):
+        if values.get(key):
+            minutes = parse_time_of_day(values[key])
+            if minutes < 0:
+                raise ValueError(f"{key} must be a time like 06:00 or 6:00 PM")
+            filters[name] = minutes
+    return filters
+
+def validation_error_response(errors):
+    """400 response listing every invalid field"""
+    logger.info(f"Rejected invalid search request: {[error['message'] for error in errors]}")
+    return jsonify({
+        "error": "; ".join(error['message'] for error in errors),
+        "errors": errors
+    }), 400
 
-    return system_prompt
+def one_way_keys(params):
+    """Cache keys of the one-way searches a request needs (the return leg too for round trips)"""
+    passengers = params.get('passengers', 1)
+    keys = [search_key(params.get('departure'), params.get('arrival'), params.get('departureDate'), '', passengers)]
+    if params.get('returnDate'):
+        keys.append(search_key(params.get('arrival'), params.get('departure'), params['returnDate'], '', passengers))
+    return keys
+
+def record_search(searches):
+    """Count one user request towards the prefetcher's hot routes, whatever the number of searches it fans out to"""
+    if PREFETCH_ENABLED:
+        # Started on first use so the reloader's watcher process never runs it
+        prefetcher.start()
+        prefetcher.record([key for params in searches for key in one_way_keys(params)])
+
+def search_one_way(params):
+    """Cached one-way search: a fresh result for the same route, date and passengers is reused"""
+    params = dict(params, returnDate='')
+    return search_cache.get_or_compute(one_way_keys(params)[0], lambda: fetch_flight_options(params))
+
+def search_flight_options(params):
+    """Search flights; round trips search both legs concurrently and pair them server-side"""
+    currency = params.get('currency') or DEFAULT_CURRENCY
+    if not params.get('returnDate'):
+        return normalize_options(search_one_way(params), currency, fx_table, DEFAULT_CURRENCY)
+    
+    # Each leg is an ordinary one-way search with its own cache entry
+    return_leg = dict(params, departure=params.get('arrival'), arrival=params.get('departure'),
+                      departureDate=params['returnDate'])
+    return_future = submit_in_context(leg_executor, search_one_way, return_leg)
+    try:
+        outbound_options = normalize_options(search_one_way(params), currency, fx_table, DEFAULT_CURRENCY)
+    except Exception:
+        # Don't leave the return leg holding a leg thread (it also stops once the request scope closes)
+        return_future.cancel()
+        raise
+    return_options = normalize_options(return_future.result(), currency, fx_table, DEFAULT_CURRENCY)
+    return combine_round_trips(outbound_options, return_options, limit=ROUND_TRIP_LEG_LIMIT)
+
+def refresh_search(key):
+    """Re-run the upstream search for a cache key; returns (value, cacheable) (used by the prefetcher)"""
+    departure, arrival, departure_date, return_date, passengers = key
+    return fetch_flight_options({
+        'departure': departure,
+        'arrival': arrival,
+        'departureDate': departure_date,
+        'returnDate': return_date,
+        'passengers': passengers
+    }, background=True)
+
+# Background cache warmer for the most searched routes
+prefetcher = PrefetchScheduler(
+    search_cache,
+    refresh_search,
+    top_k=PREFETCH_TOP_K,
+    interval=PREFETCH_INTERVAL,
+    refresh_ahead=min(PREFETCH_REFRESH_AHEAD, SEARCH_CACHE_TTL / 2),
+    max_refreshes_per_minute=PREFETCH_MAX_PER_MINUTE
+)
+
+def build_search_response(flight_options, weights=DEFAULT_WEIGHTS, **filters):
+    """Rank (and optionally filter) options server-side and attach the local analysis and recommendations"""
+    table = FlightTable(dedupe_options(flight_options))
+    ranked = table.top(weights, **filters)
+    analysis = analyze_flights(FlightTable(ranked) if filters else table)
+    return {
+        "results": [option.to_dict() for option in ranked],
+        # Analysis and recommendations are computed locally, not by the LLM
+        "analysis": analysis,
+        "recommendations": recommend_flights(analysis)
+    }
 
 @app.route('/api/search-flights', methods=['POST'])
 def search_flights():
@@ -209,7 +672,7 @@ def search_flights():
         logger.info("Starting new flight search request")
         logger.info("="*50)
         
-        data = request.json
+        data = request.json or {}
         logger.info(f"\nRequest Parameters:")
         logger.info(f"Departure: {data.get('departure', '')}")
         logger.info(f"Arrival: {data.get('arrival', '')}")
@@ -217,183 +680,275 @@ def search_flights():
         logger.info(f"Return Date: {data.get('returnDate', '')}")
         logger.info(f"Passengers: {data.get('passengers', 1)}")
         
-        # Get system prompt
-        logger.info("\nGenerating system prompt...")
-        system_prompt = get_system_prompt(data)
-        logger.info("System prompt generated successfully")
+        # Reject invalid input before spending an upstream call on it
+        data, errors = validate_search_params(data or {})
+        if errors:
+            return validation_error_response(errors)
         
-        # Prepare the prompt for Gemini
-        logger.info("\nPreparing Gemini API request...")
-        prompt = f"""
-        {system_prompt}
+        record_search([data])
+        scope = upstream_pool.open_scope(data.get('requestId'), request_timeout(data))
+        try:
+            flight_options = search_flight_options(data)
+        finally:
+            upstream_pool.close_scope(scope)
+        results = build_search_response(flight_options)
         
-        Please search for flights with the following details:
-        - Departure: {data.get('departure', '')}
-        - Arrival: {data.get('arrival', '')}
-        - Departure Date: {data.get('departureDate', '')}
-        - Return Date: {data.get('returnDate', '')}
-        - Passengers: {data.get('passengers', 1)}
+        # Keep the parsed options so follow-up refinements are answered locally
+        results["sessionId"] = session_store.save(data, flight_options, data.get('sessionId'))
+        # Further pages and views are served from the stored result set via /api/results/<id>
+        results["resultSetId"] = result_store.save(data, flight_options)
+        results["total"] = len(results["results"])
+        if data.get('pageSize'):
+            results["results"] = results["results"][:data['pageSize']]
         
-        IMPORTANT: You must respond with ONLY a valid JSON object in the following format:
-        {{
-            "results": [
-                {{
-                    "airline": "string",
-                    "price": "string",
-                    "departureTime": "string",
-                    "arrivalTime": "string",
-                    "duration": "string",
-                    "stops": "string",
-                    "source": "string",
-                    "recommendation": "string"
-                }}
-            ]
-        }}
+        logger.info("\nSending flight search results to client...")
+        logger.info("="*50 + "\n")
+        return jsonify(results)
         
-        Do not include any additional text, explanations, or markdown formatting. Only the JSON object.
-        """
+    except (Overloaded, DeadlineExceeded, Cancelled) as e:
+        return upstream_error_response(e)
+    except Exception as e:
+        logger.error(f"\nError in flight search: {str(e)}")
+        logger.error("="*50 + "\n")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/analyze-flights', methods=['POST'])
+def analyze_flights_endpoint():
+    """Analyze and recommend from a list of flight options without calling the LLM"""
+    try:
+        data = request.json or {}
+        flights = data.get('flights', data.get('results', []))
+        if not isinstance(flights, list):
+            return jsonify({"error": "'flights' must be a list"}), 400
+        
+        currency = str(data.get('currency') or DEFAULT_CURRENCY).upper()
+        if not fx_table.supports(currency):
+            return jsonify({"error": f"Unsupported currency: '{currency}'"}), 400
         
-        # Send request to Gemini API
-        logger.info("\nSending request to Gemini API...")
-        response = model.generate_content(prompt)
-        logger.info("\nRaw Gemini API Response:")
-        logger.info(response.text)
+        options = normalize_options(parse_flight_options(flights), currency, fx_table, DEFAULT_CURRENCY)
+        analysis = analyze_flights(dedupe_options(options))
+        logger.info(f"Analyzed {len(flights)} flight options locally: {analysis['metrics']}")
+        return jsonify({
+            "analysis": analysis,
+            "recommendations": recommend_flights(analysis)
+        })
         
+    except Exception as e:
+        logger.error(f"Error in flight analysis: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/search-flights/flexible', methods=['POST'])
+def search_flights_flexible():
+    """Search a window of departure dates concurrently and return a date x price matrix"""
+    try:
+        data, errors = validate_search_params(request.json or {})
+        if errors:
+            return validation_error_response(errors)
         try:
-            # Clean and parse the response
-            logger.info("\nProcessing Gemini API response...")
-            response_text = response.text.strip()
-            
-            # Remove any markdown formatting
-            response_text = response_text.replace('```json', '').replace('```', '')
-            response_text = response_text.strip()
-            
-            # Find the JSON object in the response
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
-            if start_idx >= 0 and end_idx > start_idx:
-                response_text = response_text[start_idx:end_idx]
-            
-            logger.info("\nCleaned response text:")
-            logger.info(response_text)
-            
-            # Parse the response
-            results = json.loads(response_text)
-            
-            # Log the structure of the response
-            logger.info("\nResponse structure:")
-            logger.info(f"Type: {type(results)}")
-            logger.info(f"Keys: {results.keys() if isinstance(results, dict) else 'Not a dictionary'}")
-            
-            # Validate the response structure
-            if not isinstance(results, dict):
-                raise ValueError("Response is not a dictionary")
-            
-            # Check if the response has the expected structure
-            if "results" not in results:
-                # Try to find flight information in the response
-                flight_info = []
-                for key, value in results.items():
-                    logger.info(f"\nChecking key: {key}")
-                    logger.info(f"Value type: {type(value)}")
-                    
-                    if isinstance(value, list):
-                        for item in value:
-                            if isinstance(item, dict):
-                                logger.info(f"Item keys: {item.keys()}")
-                                if any(field in item for field in ['airline', 'price', 'departureTime']):
-                                    flight_info.append(item)
-                
-                if flight_info:
-                    logger.info(f"\nFound {len(flight_info)} flight options in alternative format")
-                    results = {"results": flight_info}
-                else:
-                    raise ValueError("Response missing 'results' key and no flight information found")
-            
-            if not isinstance(results["results"], list):
-                raise ValueError("'results' is not a list")
-            
-            # Validate each flight entry
-            valid_flights = []
-            for flight in results["results"]:
-                if isinstance(flight, dict):
-                    valid_flight = {
-                        "airline": flight.get("airline", "Unknown"),
-                        "price": flight.get("price", "N/A"),
-                        "departureTime": flight.get("departureTime", "N/A"),
-                        "arrivalTime": flight.get("arrivalTime", "N/A"),
-                        "duration": flight.get("duration", "N/A"),
-                        "stops": flight.get("stops", "N/A"),
-                        "source": flight.get("source", "N/A"),
-                        "recommendation": flight.get("recommendation", "N/A")
-                    }
-                    valid_flights.append(valid_flight)
-            
-            results["results"] = valid_flights
-            
-            logger.info("\nSuccessfully parsed flight results:")
-            for flight in results["results"]:
-                logger.info(f"\nFlight Option:")
-                logger.info(f"Airline: {flight['airline']}")
-                logger.info(f"Price: {flight['price']}")
-                logger.info(f"Departure: {flight['departureTime']}")
-                logger.info(f"Arrival: {flight['arrivalTime']}")
-                logger.info(f"Duration: {flight['duration']}")
-                logger.info(f"Stops: {flight['stops']}")
-                logger.info(f"Source: {flight['source']}")
-                logger.info(f"Recommendation: {flight['recommendation']}")
-            
-        except (json.JSONDecodeError, ValueError) as e:
-            logger.error(f"\nFailed to parse Gemini API response: {str(e)}")
-            logger.error(f"Response that failed to parse: {response_text}")
-            logger.info("\nUsing mock data as fallback...")
-            
-            # If parsing fails, use mock data
-            results = {
-                "results": [
-                    {
-                        "airline": "Lufthansa",
-                        "price": "INR 45,000",
-                        "departureTime": "10:00 AM",
-                        "arrivalTime": "11:30 PM",
-                        "duration": "9h 30m",
-                        "stops": "Non-stop",
-                        "source": "Skyscanner",
-                        "recommendation": "Best direct flight option with good service"
-                    },
-                    {
-                        "airline": "Emirates",
-                        "price": "INR 42,500",
-                        "departureTime": "2:30 PM",
-                        "arrivalTime": "6:00 AM (next day)",
-                        "duration": "8h 30m",
-                        "stops": "1 stop in Dubai",
-                        "source": "Skyscanner",
-                        "recommendation": "Good value with short layover in Dubai"
-                    }
-                ]
-            }
+            base_date = datetime.strptime(data.get('departureDate', ''), '%Y-%m-%d').date()
+            return_date = (datetime.strptime(data['returnDate'], '%Y-%m-%d').date()
+                           if data.get('returnDate') else None)
+            flex_days = int(data.get('flexDays', FLEX_MAX_DAYS))
+        except ValueError:
+            return jsonify({"error": "departureDate/returnDate must be YYYY-MM-DD and flexDays an integer"}), 400
+        flex_days = max(0, min(flex_days, FLEX_MAX_DAYS))
+        
+        # Shift the return date with the departure date to keep the trip length
+        today = datetime.now().date()
+        searches = []
+        for offset in range(-flex_days, flex_days + 1):
+            departure_date = base_date + timedelta(days=offset)
+            if departure_date < today:
+                continue
+            params = dict(data, departureDate=departure_date.isoformat(),
+                          returnDate=(return_date + timedelta(days=offset)).isoformat() if return_date else '')
+            searches.append(params)
+        
+        logger.info(f"Flexible search {data.get('departure', '')}->{data.get('arrival', '')}: "
+                    f"{len(searches)} dates, up to {FLEX_SEARCH_CONCURRENCY} in parallel")
+        
+        # Per-date searches go through the shared cache, so only cold dates hit upstream
+        record_search(searches)
+        scope = upstream_pool.open_scope(data.get('requestId'), request_timeout(data))
+        futures = []
+        try:
+            futures = [submit_in_context(flex_executor, search_flight_options, params) for params in searches]
+            options_by_date = []
+            failed_dates = []
+            for params, future in zip(searches, futures):
+                try:
+                    options_by_date.append(future.result())
+                except (Overloaded, DeadlineExceeded, Cancelled) as e:
+                    # Report the date as missing rather than failing the whole grid
+                    options_by_date.append([])
+                    failed_dates.append({"date": params['departureDate'], "error": type(e).__name__})
+        finally:
+            # After any other error the remaining dates are not waited for: drop queued ones,
+            # and closing the scope cancels the running ones
+            for future in futures:
+                future.cancel()
+            upstream_pool.close_scope(scope)
+        if failed_dates and len(failed_dates) == len(searches):
+            return upstream_error_response(futures[0].exception())
+        
+        airlines = sorted({option.airline for options in options_by_date for option in options})
+        column = {airline: i for i, airline in enumerate(airlines)}
+        matrix = []
+        cheapest_by_date = []
+        cheapest = None
+        for params, options in zip(searches, options_by_date):
+            row = [None] * len(airlines)
+            for option in options:
+                i = column[option.airline]
+                if option.price == option.price and (row[i] is None or option.price < row[i]):
+                    row[i] = option.price
+            matrix.append(row)
             
-            logger.info("\nMock flight results:")
-            for flight in results["results"]:
-                logger.info(f"\nFlight Option:")
-                logger.info(f"Airline: {flight['airline']}")
-                logger.info(f"Price: {flight['price']}")
-                logger.info(f"Departure: {flight['departureTime']}")
-                logger.info(f"Arrival: {flight['arrivalTime']}")
-                logger.info(f"Duration: {flight['duration']}")
-                logger.info(f"Stops: {flight['stops']}")
-                logger.info(f"Source: {flight['source']}")
-                logger.info(f"Recommendation: {flight['recommendation']}")
+            table = FlightTable(options)
+            best = table.top(weights=(1, 0, 0), limit=1)
+            best = best[0] if best else None
+            cheapest_by_date.append({"date": params['departureDate'], "flight": best.to_dict() if best else None})
+            if best is not None and best.price == best.price and (cheapest is None or best.price < cheapest[1].price):
+                cheapest = (params['departureDate'], best)
         
-        logger.info("\nSending flight search results to client...")
-        logger.info("="*50 + "\n")
+        return jsonify({
+            "dates": [params['departureDate'] for params in searches],
+            "airlines": airlines,
+            "matrix": matrix,
+            "cheapestByDate": cheapest_by_date,
+            "cheapest": {"date": cheapest[0], "flight": cheapest[1].to_dict()} if cheapest else None,
+            "failedDates": failed_dates,
+            "cache": search_cache.stats()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in flexible flight search: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/airports/autocomplete', methods=['GET'])
+def autocomplete_airports():
+    """Prefix autocomplete over airport codes, cities, names and aliases"""
+    query = request.args.get('q', '')
+    try:
+        limit = max(1, min(int(request.args.get('limit', 8)), 50))
+    except ValueError:
+        limit = 8
+    return jsonify({"airports": [airport.to_dict() for airport in airport_index.autocomplete(query, limit)]})
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Search cache and prefetcher counters"""
+    return jsonify({
+        "search_cache": search_cache.stats(),
+        "result_sets": result_store.stats(),
+        "prefetch": prefetcher.stats(),
+        "upstream": upstream_pool.stats()
+    })
+
+@app.route('/api/sessions/<session_id>', methods=['GET', 'DELETE'])
+def flight_session(session_id):
+    """Return or drop a stored search session"""
+    if request.method == 'DELETE':
+        return jsonify({"deleted": session_store.delete(session_id)})
+    session = session_store.get(session_id)
+    if session is None:
+        return jsonify({"error": "Unknown or expired session"}), 404
+    results = build_search_response(session.options)
+    results["sessionId"] = session_id
+    results["params"] = session.params
+    return jsonify(results)
+
+@app.route('/api/sessions/<session_id>/refine', methods=['POST'])
+def refine_flight_session(session_id):
+    """Filter, sort or re-price a session's last results locally, without calling the LLM"""
+    try:
+        session = session_store.get(session_id)
+        if session is None:
+            return jsonify({"error": "Unknown or expired session"}), 404
+        
+        data = request.json or {}
+        sort = data.get('sort', 'best')
+        if sort not in SORT_WEIGHTS:
+            return jsonify({"error": f"sort must be one of {', '.join(SORT_WEIGHTS)}"}), 400
+        try:
+            filters = parse_result_filters(data)
+            passengers = int(data.get('passengers', session.params.get('passengers', 1)))
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid refinement value"}), 400
+        if not 1 <= passengers <= MAX_PASSENGERS:
+            return jsonify({"error": f"Passengers must be between 1 and {MAX_PASSENGERS}"}), 400
+        currency = str(data.get('currency') or session.params.get('currency') or DEFAULT_CURRENCY).upper()
+        if not fx_table.supports(currency):
+            return jsonify({"error": f"Unsupported currency: '{currency}'"}), 400
+        
+        options = normalize_options(session.options, currency, fx_table, DEFAULT_CURRENCY)
+        previous_passengers = int(session.params.get('passengers', 1))
+        if passengers != previous_passengers:
+            # Quoted prices are for the whole party; scale them to the new passenger count
+            options = scale_prices(options, passengers / previous_passengers)
+        
+        results = build_search_response(options, SORT_WEIGHTS[sort], **filters)
+        results["sessionId"] = session_id
+        results["refinement"] = {"sort": sort, "passengers": passengers, "currency": currency,
+                                 **filters}
+        logger.info(f"Refined session {session_id} locally: {results['refinement']}, {len(results['results'])} options")
         return jsonify(results)
         
     except Exception as e:
-        logger.error(f"\nError in flight search: {str(e)}")
-        logger.error("="*50 + "\n")
+        logger.error(f"Error refining flight session: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/results/<result_set_id>', methods=['GET'])
+def query_result_set(result_set_id):
+    """Page, sort and filter a stored search result set without re-searching"""
+    result_set_session = result_store.get(result_set_id)
+    if result_set_session is None:
+        return jsonify({"error": "Unknown or expired result set"}), 404
+    
+    sort = request.args.get('sort', 'best')
+    if sort not in SORT_KEYS:
+        return jsonify({"error": f"sort must be one of {', '.join(SORT_KEYS)}"}), 400
+    try:
+        offset = max(int(request.args.get('offset', 0)), 0)
+        limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        filters = parse_result_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query value: {e}"}), 400
+    
+    total, page = result_set_session.result_set().query(sort, offset, limit, **filters)
+    return jsonify({
+        "resultSetId": result_set_id,
+        "results": [option.to_dict() for option in page],
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "sort": sort,
+        "filters": filters,
+        "nextOffset": offset + limit if offset + limit < total else None
+    })
+
+@app.route('/api/requests/<request_id>/cancel', methods=['POST'])
+def cancel_request(request_id):
+    """Cancel a client's in-flight search; queued upstream calls for it are dropped"""
+    cancelled = upstream_pool.cancel(request_id)
+    if cancelled:
+        logger.info(f"Cancelled request {request_id}")
+    return jsonify({"cancelled": cancelled})
+
+@app.route('/api/health', methods=['GET'])
+def health():
+    """Liveness check with start-up time and whether the model has been built yet"""
+    return jsonify({
+        "status": "ok",
+        "startup_ms": round(STARTUP_SECONDS * 1000, 1),
+        "model_ready": model is not None
+    })
+
+STARTUP_SECONDS = time.perf_counter() - STARTUP_BEGAN
+logger.info(f"flight_server ready in {STARTUP_SECONDS * 1000:.0f} ms")
+
 if __name__ == '__main__':
+    # With the reloader on, only the serving child process warms up the model
+    if MODEL_WARMUP and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        warm_up_model()
     app.run(host='0.0.0.0', port=5000, debug=True) 
\ No newline at end of file
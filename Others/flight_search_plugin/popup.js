@@ -76,8 +76,33 @@ function displayResults(flights) {
   resultsDiv.appendChild(flightsList);
 }
 
+// Fill the airport suggestions for an input as the user types
+async function updateAirportSuggestions(input, datalist) {
+  const query = input.value.trim();
+  if (query.length < 2) {
+    return;
+  }
+  const response = await chrome.runtime.sendMessage({ action: 'autocompleteAirports', query });
+  if (response.error || input.value.trim() !== query) {
+    return;
+  }
+  datalist.innerHTML = '';
+  response.airports.forEach(airport => {
+    const option = document.createElement('option');
+    option.value = airport.iata || airport.icao;
+    option.label = `${airport.city} - ${airport.name}`;
+    datalist.appendChild(option);
+  });
+}
+
 // Initialize the popup
 document.addEventListener('DOMContentLoaded', () => {
+  ['departure', 'arrival'].forEach(id => {
+    const input = document.getElementById(id);
+    const datalist = document.getElementById(`${id}Airports`);
+    input.addEventListener('input', () => updateAirportSuggestions(input, datalist));
+  });
+  
   // Set minimum date for date inputs to today
   const today = new Date().toISOString().split('T')[0];
   document.getElementById('departureDate').min = today;
@@ -0,0 +1,155 @@
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger("flight_search")
+
+
+class DecayingTopK:
+    """Approximate top-K of search keys with exponentially decaying counts.
+
+    Counts halve every `half_life` seconds so yesterday's popular routes fade
+    out. At most `capacity` keys are tracked; when full, the weakest key is
+    replaced and the newcomer inherits its count (space-saving sketch).
+    """
+
+    def __init__(self, capacity=200, half_life=3600.0):
+        self.capacity = capacity
+        self.decay_rate = math.log(2) / half_life
+        self._origin = time.monotonic()
+        self._scores = {}  # key -> count scaled to time _origin
+        self._lock = threading.Lock()
+
+    def _weight(self, now):
+        # Instead of decaying every count, new hits are scaled up over time
+        return math.exp(self.decay_rate * (now - self._origin))
+
+    def add(self, key, count=1.0):
+        now = time.monotonic()
+        with self._lock:
+            weight = self._weight(now)
+            if weight > 1e100:
+                # Rebase before the scaled counts overflow
+                self._scores = {k: v / weight for k, v in self._scores.items()}
+                self._origin = now
+                weight = 1.0
+            if key not in self._scores and len(self._scores) >= self.capacity:
+                weakest = min(self._scores, key=self._scores.get)
+                self._scores[key] = self._scores.pop(weakest)
+            self._scores[key] = self._scores.get(key, 0.0) + count * weight
+
+    def top(self, k):
+        """The k hottest keys with their current decayed counts, hottest first"""
+        with self._lock:
+            weight = self._weight(time.monotonic())
+            ranked = sorted(self._scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(key, score / weight) for key, score in ranked]
+
+
+class PrefetchScheduler:
+    """Background thread that refreshes hot cache entries before they expire.
+
+    Every `interval` seconds it looks at the `top_k` hottest keys and refreshes
+    those that are missing or expire within `refresh_ahead` seconds, spending at
+    most `max_refreshes_per_minute` upstream calls.
+    """
+
+    def __init__(self, cache, refresh, top_k=20, interval=30.0, refresh_ahead=120.0,
+                 max_refreshes_per_minute=6, min_score=2.0, half_life=3600.0):
+        self.cache = cache
+        # refresh(key) -> (value, cacheable); run through cache.get_or_compute so a user
+        # searching the same key meanwhile waits for this call instead of starting another
+        self.refresh = refresh
+        self.sketch = DecayingTopK(capacity=top_k * 10, half_life=half_life)
+        self.top_k = top_k
+        self.interval = interval
+        self.refresh_ahead = refresh_ahead
+        self.min_score = min_score
+        # Token bucket holding up to one minute of upstream budget
+        self.budget_per_second = max_refreshes_per_minute / 60.0
+        self.max_tokens = float(max_refreshes_per_minute)
+        self._tokens = self.max_tokens
+        self._last_fill = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+        self.refreshed = 0
+        self.skipped_budget = 0
+        self.failures = 0
+
+    def record(self, keys):
+        """Count one user request, split evenly over the cache keys it searched"""
+        for key in keys:
+            self.sketch.add(key, 1.0 / len(keys))
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='cache-prefetch', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _take_token(self):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._last_fill) * self.budget_per_second)
+        self._last_fill = now
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        return False
+
+    def _today(self):
+        return time.strftime('%Y-%m-%d')
+
+    def due_keys(self):
+        """Hot keys whose cache entry is missing or about to expire, hottest first"""
+        today = self._today()
+        due = []
+        for key, score in self.sketch.top(self.top_k):
+            if score < self.min_score:
+                break
+            # Key is (departure, arrival, departureDate, ...); past dates are not worth refreshing
+            if len(key) > 2 and key[2] and key[2] < today:
+                continue
+            expires_in = self.cache.expires_in(key)
+            if expires_in is None or expires_in <= self.refresh_ahead:
+                due.append(key)
+        return due
+
+    def run_once(self):
+        """One scheduling pass; returns the number of refreshed keys"""
+        refreshed = 0
+        for key in self.due_keys():
+            if not self._take_token():
+                self.skipped_budget += 1
+                break
+            try:
+                self.cache.get_or_compute(key, lambda: self.refresh(key), refresh=True)
+                expires_in = self.cache.expires_in(key)
+                if expires_in is not None and expires_in > self.refresh_ahead:
+                    refreshed += 1
+            except Exception as e:
+                self.failures += 1
+                logger.warning(f"Prefetch of {key} failed: {str(e)}")
+        self.refreshed += refreshed
+        if refreshed:
+            logger.info(f"Prefetched {refreshed} hot search(es)")
+        return refreshed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Prefetch pass failed: {str(e)}")
+
+    def stats(self):
+        return {
+            "running": bool(self._thread and self._thread.is_alive()),
+            "refreshed": self.refreshed,
+            "skipped_budget": self.skipped_budget,
+            "failures": self.failures,
+            "hot_routes": [{"key": list(key), "score": round(score, 2)} for key, score in self.sketch.top(10)]
+        }
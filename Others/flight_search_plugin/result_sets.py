@@ -0,0 +1,30 @@
+import numpy as np
+
+from flight_records import SORT_WEIGHTS, FlightTable, dedupe_options
+
+# Weighted rankings plus plain departure-time order
+SORT_KEYS = tuple(SORT_WEIGHTS) + ('departure',)
+
+
+class ResultSet:
+    """Deduplicated options of one search with a precomputed row order per sort key.
+
+    A query only builds a filter mask and slices the chosen order, so paging,
+    re-sorting and filtering never re-rank the options or call upstream.
+    """
+
+    def __init__(self, options):
+        self.table = FlightTable(dedupe_options(options))
+        self.orders = {name: self.table.rank(weights) for name, weights in SORT_WEIGHTS.items()}
+        # argsort puts unknown (NaN) departure times last
+        self.orders['departure'] = np.argsort(self.table.departure, kind='stable')
+
+    def __len__(self):
+        return len(self.table)
+
+    def query(self, sort='best', offset=0, limit=20, **filters):
+        """(matching count, FlightOption page) for one view of the result set"""
+        order = self.orders[sort]
+        if filters:
+            order = order[self.table.mask(**filters)[order]]
+        return len(order), [self.table.options[i] for i in order[offset:offset + limit]]
@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from upstream import Cancelled, DeadlineExceeded, RequestScope, current_scope, submit_in_context
+
+
+def search_key(departure, arrival, departure_date, return_date='', passengers=1):
+    """Normalized cache key for one search"""
+    return (
+        str(departure or '').strip().upper(),
+        str(arrival or '').strip().upper(),
+        str(departure_date or '').strip(),
+        str(return_date or '').strip(),
+        int(passengers or 1)
+    )
+
+
+class _InFlight:
+    """Result slot shared by every caller waiting on one computation.
+
+    The computation runs under its own scope, whose deadline is the latest of
+    its waiters' deadlines; it is cancelled only when no waiter is left.
+    """
+
+    __slots__ = ('done', 'value', 'error', 'scope', 'waiters')
+
+    def __init__(self, scope):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.scope = RequestScope(timeout=scope.remaining())
+        self.waiters = 0
+
+
+class SearchCache:
+    """Thread-safe TTL + LRU cache of search results with in-flight de-duplication.
+
+    Concurrent lookups for the same key while it is being computed wait for the
+    first caller instead of starting a second upstream call. Each caller waits
+    within its own request's deadline and cancellation; the computation runs on
+    a worker thread and still fills the cache when the caller that started it
+    gives up, as long as another caller is waiting for it.
+    """
+
+    def __init__(self, ttl_seconds=900, max_entries=512, workers=32):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._pending = {}  # key -> _InFlight
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='search-compute')
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Cached value for key, or None if missing or expired"""
+        with self._lock:
+            return self._get_locked(key)
+
+    def _get_locked(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def expires_in(self, key):
+        """Seconds until key expires, or None if it is not cached"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry[0] - time.monotonic()
+
+    def get_or_compute(self, key, compute, scope=None, refresh=False):
+        """Return the cached value for key or compute it once.
+
+        compute() returns (value, cacheable); values that are not cacheable
+        (e.g. mock fallbacks) are shared with concurrent waiters but not stored.
+        refresh=True recomputes even if a cached value exists (still joining a
+        computation already in flight). The caller waits until scope (default: the current request's) is
+        cancelled or past its deadline, then gets Cancelled/DeadlineExceeded.
+        """
+        scope = scope or current_scope.get() or RequestScope()
+        with self._lock:
+            value = None if refresh else self._get_locked(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            in_flight = self._pending.get(key)
+            if in_flight is None or in_flight.scope.cancelled.is_set():
+                # Nobody is computing this key (or the computation was abandoned)
+                self.misses += not refresh
+                in_flight = self._pending[key] = _InFlight(scope)
+                submit_in_context(self._executor, self._compute, key, in_flight, compute)
+            # The computation lives as long as its longest-waiting caller
+            in_flight.scope.deadline = max(in_flight.scope.deadline, scope.deadline)
+            in_flight.waiters += 1
+
+        try:
+            while not in_flight.done.is_set():
+                if scope.cancelled.is_set():
+                    raise Cancelled()
+                remaining = scope.remaining()
+                if remaining <= 0:
+                    raise DeadlineExceeded()
+                in_flight.done.wait(min(remaining, 0.25))
+        finally:
+            with self._lock:
+                in_flight.waiters -= 1
+                abandoned = not in_flight.waiters and not in_flight.done.is_set()
+            if abandoned:
+                # Nobody wants the result any more; stop before (or while) calling upstream
+                in_flight.scope.cancelled.set()
+
+        if isinstance(in_flight.error, (Cancelled, DeadlineExceeded)):
+            # Only reachable once every waiter's own deadline has passed
+            raise type(in_flight.error)()
+        if in_flight.error is not None:
+            raise in_flight.error
+        return in_flight.value
+
+    def _compute(self, key, in_flight, compute):
+        # Upstream calls made by compute() are bound to the shared scope, not to any one caller
+        current_scope.set(in_flight.scope)
+        try:
+            value, cacheable = compute()
+            in_flight.value = value
+            if cacheable:
+                self.put(key, value)
+        except Exception as e:
+            in_flight.error = e
+        finally:
+            with self._lock:
+                if self._pending.get(key) is in_flight:
+                    del self._pending[key]
+            in_flight.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "ttl_seconds": self.ttl_seconds
+            }
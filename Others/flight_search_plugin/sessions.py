@@ -0,0 +1,123 @@
+import copy
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from result_sets import ResultSet
+
+
+def estimate_size(options):
+    """Rough memory footprint of a list of FlightOption records in bytes"""
+    total = sys.getsizeof(options)
+    for option in options:
+        total += sys.getsizeof(option)
+        for name in ('airline', 'price_text', 'duration_text', 'stops_text',
+                     'departure_time', 'arrival_time', 'source', 'recommendation'):
+            total += sys.getsizeof(getattr(option, name))
+        if option.legs:
+            total += estimate_size(list(option.legs))
+    return total
+
+
+def scale_prices(options, factor):
+    """Copies of the options with prices (and round-trip legs) multiplied by factor"""
+    scaled = []
+    for option in options:
+        option = copy.copy(option)
+        option.price = round(option.price * factor, 2)
+        if option.legs:
+            option.legs = tuple(scale_prices(option.legs, factor))
+        scaled.append(option)
+    return scaled
+
+
+class FlightSession:
+    """Conversation state for one client: the last search and its parsed options"""
+
+    __slots__ = ('session_id', 'params', 'options', 'size', 'created_at', 'last_used', '_result_set')
+
+    def __init__(self, session_id, params, options):
+        self.session_id = session_id
+        self.params = dict(params)
+        self.options = options
+        self.size = estimate_size(options)
+        self.created_at = self.last_used = time.monotonic()
+        self._result_set = None
+
+    def result_set(self):
+        """Sorted, queryable view of the options, built on first use"""
+        if self._result_set is None:
+            self._result_set = ResultSet(self.options)
+        return self._result_set
+
+
+class SessionStore:
+    """Keyed flight sessions with LRU eviction, idle TTL and a total memory cap"""
+
+    def __init__(self, ttl_seconds=1800, max_sessions=1000, max_bytes=64 * 1024 * 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def save(self, params, options, session_id=None):
+        """Store (or replace) a session's search result; returns the session id"""
+        session_id = session_id or uuid.uuid4().hex
+        session = FlightSession(session_id, params, options)
+        with self._lock:
+            old = self._sessions.pop(session_id, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._sessions[session_id] = session
+            self._bytes += session.size
+            self._evict_locked()
+        return session_id
+
+    def get(self, session_id):
+        """Session by id (refreshing its LRU position), or None if unknown or expired"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            now = time.monotonic()
+            if now - session.last_used > self.ttl_seconds:
+                self._remove_locked(session_id)
+                return None
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._remove_locked(session_id) is not None
+
+    def _remove_locked(self, session_id):
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._bytes -= session.size
+        return session
+
+    def _evict_locked(self):
+        now = time.monotonic()
+        # Sessions are kept in LRU order, so expired and least recently used ones are at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            expired = now - session.last_used > self.ttl_seconds
+            if not (expired or len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+                break
+            self._remove_locked(session.session_id)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions
+            }
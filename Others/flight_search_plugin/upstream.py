@@ -0,0 +1,171 @@
+import contextvars
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class Overloaded(Exception):
+    """The upstream queue is full; the caller should retry later (HTTP 503)"""
+
+
+class DeadlineExceeded(Exception):
+    """The request ran out of time before the upstream call finished (HTTP 504)"""
+
+
+class Cancelled(Exception):
+    """The client cancelled the request or went away"""
+
+
+class RequestScope:
+    """Deadline and cancellation flag for one client request"""
+
+    __slots__ = ('request_id', 'deadline', 'cancelled')
+
+    def __init__(self, request_id=None, timeout=30.0):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.deadline = time.monotonic() + timeout
+        self.cancelled = threading.Event()
+
+    def remaining(self):
+        return self.deadline - time.monotonic()
+
+
+# Scope of the request being served by the current thread (copied into helper pools)
+current_scope = contextvars.ContextVar('current_scope', default=None)
+
+
+def submit_in_context(executor, func, *args):
+    """executor.submit that carries the caller's request scope into the worker thread"""
+    return executor.submit(contextvars.copy_context().run, func, *args)
+
+
+class UpstreamPool:
+    """Bounded pool of workers for blocking model calls with a bounded admission queue.
+
+    At most `workers` calls run at once and at most `queue_size` more wait;
+    anything beyond that is rejected immediately with Overloaded. Calls whose
+    request is cancelled or past its deadline before a worker picks them up
+    never reach the upstream API.
+    """
+
+    def __init__(self, workers=4, queue_size=16, default_timeout=30.0):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.default_timeout = default_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='upstream')
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._running = 0
+        self._scopes = {}  # request_id -> set of RequestScope
+        self.rejected = 0
+        self.timed_out = 0
+        self.cancelled = 0
+        self.completed = 0
+
+    def open_scope(self, request_id=None, timeout=None):
+        """Start tracking a client request; returns a RequestScope and makes it current"""
+        scope = RequestScope(request_id, timeout or self.default_timeout)
+        with self._lock:
+            self._scopes.setdefault(scope.request_id, set()).add(scope)
+        current_scope.set(scope)
+        return scope
+
+    def close_scope(self, scope):
+        """Stop tracking a finished request; helper work still running under its scope is cancelled"""
+        # Nothing reads the results any more (e.g. the return leg after the outbound leg failed)
+        scope.cancelled.set()
+        with self._lock:
+            scopes = self._scopes.get(scope.request_id)
+            if scopes is not None:
+                scopes.discard(scope)
+                if not scopes:
+                    del self._scopes[scope.request_id]
+        current_scope.set(None)
+
+    def cancel(self, request_id):
+        """Cancel every in-flight call of a request; returns True if the request was known"""
+        with self._lock:
+            scopes = list(self._scopes.get(request_id, ()))
+        for scope in scopes:
+            scope.cancelled.set()
+        return bool(scopes)
+
+    def _admit(self, background):
+        with self._lock:
+            # Background work (e.g. prefetching) only runs on otherwise idle workers
+            limit = self.workers if background else self.workers + self.queue_size
+            if self._admitted >= limit:
+                self.rejected += 1
+                return False
+            self._admitted += 1
+            return True
+
+    def _release(self, future):
+        with self._lock:
+            self._admitted -= 1
+
+    def _run(self, scope, func, args, kwargs):
+        if scope.cancelled.is_set():
+            raise Cancelled()
+        if scope.remaining() <= 0:
+            raise DeadlineExceeded()
+        with self._lock:
+            self._running += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def call(self, func, *args, background=False, **kwargs):
+        """Run func on an upstream worker within the current request's deadline"""
+        scope = current_scope.get() or RequestScope(timeout=self.default_timeout)
+        if not self._admit(background):
+            raise Overloaded()
+        try:
+            future = self._executor.submit(self._run, scope, func, args, kwargs)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+
+        # Wake up periodically so a cancellation is noticed while waiting
+        while True:
+            remaining = scope.remaining()
+            if remaining <= 0:
+                future.cancel()
+                with self._lock:
+                    self.timed_out += 1
+                raise DeadlineExceeded()
+            done, _ = wait([future], timeout=min(remaining, 0.25))
+            if done:
+                break
+            if scope.cancelled.is_set():
+                future.cancel()
+                with self._lock:
+                    self.cancelled += 1
+                raise Cancelled()
+
+        try:
+            result = future.result()
+        except Cancelled:
+            with self._lock:
+                self.cancelled += 1
+            raise
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "running": self._running,
+                "queued": max(0, self._admitted - self._running),
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "cancelled": self.cancelled,
+                "completed": self.completed
+            }
@@ -1,10 +1,12 @@
+import time
+STARTUP_BEGAN = time.perf_counter()
+
 from flask import Flask, request, jsonify
 import os
-import requests
 from dotenv import load_dotenv
 import logging
 import json
-import time
+import threading
 
 # Load environment variables from .env file
 load_dotenv()
@@ -30,6 +32,20 @@ if not GEMINI_API_KEY:
 
 logger.info(f"API Key being used (first few chars): {GEMINI_API_KEY[:8]}...")
 
+# Shared HTTP session for Gemini calls (connection reuse); `requests` is imported on first use
+http_session = None
+http_session_lock = threading.Lock()
+
+def get_http_session():
+    """Return the shared requests.Session, creating it on first use"""
+    global http_session
+    if http_session is None:
+        with http_session_lock:
+            if http_session is None:
+                import requests
+                http_session = requests.Session()
+    return http_session
+
 # Add a root route for testing
 @app.route('/', methods=['GET'])
 def root():
@@ -38,6 +54,7 @@ def root():
         "status": "ok",
         "message": "Agentic Translator API is running",
         "api_key_status": "API key is set" if GEMINI_API_KEY else "API key is missing",
+        "startup_ms": round(STARTUP_SECONDS * 1000, 1),
         "endpoints": [
             {"path": "/", "method": "GET", "description": "This test endpoint"},
             {"path": "/api/translate", "method": "POST", "description": "Translate text to German"},
@@ -120,7 +137,7 @@ def detect_language(text):
         
         logger.info(f"Language detection request payload: {json.dumps(payload)}")
         
-        response = requests.post(
+        response = get_http_session().post(
             f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}",
             json=payload,
             headers={"Content-Type": "application/json"}
@@ -168,7 +185,7 @@ def translate_to_german(text):
         
         logger.info(f"Translation request payload: {json.dumps(payload)}")
         
-        response = requests.post(
+        response = get_http_session().post(
             f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key={GEMINI_API_KEY}",
             json=payload,
             headers={"Content-Type": "application/json"}
@@ -286,7 +303,7 @@ def direct_translate():
             }]
         }
         
-        language_response = requests.post(
+        language_response = get_http_session().post(
             f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key={GEMINI_API_KEY}",
             json=language_detection_payload,
             headers={"Content-Type": "application/json"}
@@ -323,7 +340,7 @@ def direct_translate():
         
         logger.info(f"Direct translation request payload: {json.dumps(translation_payload)}")
         
-        response = requests.post(
+        response = get_http_session().post(
             f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key={GEMINI_API_KEY}",
             json=translation_payload,
             headers={"Content-Type": "application/json"}
@@ -387,6 +404,9 @@ def after_request(response):
     response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
     return response
 
+STARTUP_SECONDS = time.perf_counter() - STARTUP_BEGAN
+logger.info(f"Translator API ready in {STARTUP_SECONDS * 1000:.0f} ms")
+
 if __name__ == '__main__':
     # Print a message to show the server has started
     logger.info(f"Starting Agentic Translator API server on http://localhost:5000")
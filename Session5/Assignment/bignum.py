@@ -0,0 +1,288 @@
+import bisect
+import math
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from decimal import MAX_EMAX, ROUND_CEILING, ROUND_FLOOR, Context, Decimal
+
+LOG2_10 = math.log2(10)
+
+# Results up to this size are computed on the calling thread; larger ones go to a worker process
+INLINE_MAX_BITS = 1 << 18
+# Hard cap on any result (2**25 bits is about 10 million decimal digits)
+MAX_RESULT_BITS = 1 << 25
+# Seconds an offloaded computation may take before its worker is killed
+WORKER_TIMEOUT = float(os.getenv("BIGNUM_TIMEOUT", "10"))
+WORKER_PROCESSES = int(os.getenv("BIGNUM_WORKERS", "2"))
+# Total size of cached factorials
+FACTORIAL_CACHE_BITS = 1 << 27
+
+# Output forms: the plain integer (default), full decimal text, a summary (digit count, leading
+# and trailing digits), hex, or "auto" (the integer when small, else a summary)
+OUTPUT_FORMS = ("int", "full", "summary", "hex", "auto")
+# "auto" returns the plain integer up to this many digits and a summary above it
+AUTO_FULL_DIGITS = 1000
+# Largest decimal number produced for output="int"/"full" (decimal conversion is quadratic)
+MAX_DECIMAL_DIGITS = 50000
+# Largest hex text, the same number of bits as MAX_DECIMAL_DIGITS decimal digits
+MAX_HEX_DIGITS = int(MAX_DECIMAL_DIGITS * LOG2_10 / 4)
+SUMMARY_DIGITS = 20
+
+
+def factorial_bits(n):
+    """Estimated size of n! in bits"""
+    return math.lgamma(n + 1) / math.log(2) if n > 1 else 1
+
+
+def power_bits(base, exponent):
+    """Estimated size of base ** exponent in bits"""
+    if exponent <= 0 or abs(base) <= 1:
+        return 1
+    return exponent * math.log2(abs(base))
+
+
+def _check_size(bits, what):
+    if bits > MAX_RESULT_BITS:
+        digits = int(bits / LOG2_10) + 1
+        raise ValueError(f"{what} would have about {digits:,} digits; "
+                         f"the limit is {int(MAX_RESULT_BITS / LOG2_10):,}")
+
+
+def _range_product(low, high):
+    """Product of the integers low < k <= high, by binary splitting"""
+    if high - low <= 32:
+        product = 1
+        for k in range(low + 1, high + 1):
+            product *= k
+        return product
+    middle = (low + high) // 2
+    return _range_product(low, middle) * _range_product(middle, high)
+
+
+def _factorial_from(start, start_value, n):
+    """n! continued from a known start! (runs in a worker process for big n)"""
+    if start_value is None:
+        return math.factorial(n)
+    return start_value * _range_product(start, n)
+
+
+class _WorkerPool:
+    """Process pool for heavy computations.
+
+    A call that times out retires its pool: new calls go to a fresh pool, and the retired one
+    (with the runaway computation) is terminated once the other calls still running on it finish.
+    """
+
+    def __init__(self, processes=WORKER_PROCESSES, timeout=WORKER_TIMEOUT):
+        self.processes = processes
+        self.timeout = timeout
+        self._pool = None
+        self._jobs = {}  # pool -> calls running on it
+        self._lock = threading.Lock()
+
+    def run(self, func, *args):
+        with self._lock:
+            if self._pool is None:
+                # spawn, not fork: the server process runs threads and an event loop
+                self._pool = multiprocessing.get_context("spawn").Pool(self.processes)
+            pool = self._pool
+            self._jobs[pool] = self._jobs.get(pool, 0) + 1
+        try:
+            return pool.apply_async(func, args).get(self.timeout)
+        except multiprocessing.TimeoutError:
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+            raise TimeoutError(f"Computation took longer than {self.timeout:g}s and was stopped")
+        finally:
+            with self._lock:
+                self._jobs[pool] -= 1
+                stop = self._pool is not pool and not self._jobs[pool]
+                if stop:
+                    del self._jobs[pool]
+            if stop:
+                pool.terminate()
+
+
+class FactorialCache:
+    """Computed factorials kept by n (LRU, capped by total bits); new ones continue from the nearest below"""
+
+    def __init__(self, max_bits=FACTORIAL_CACHE_BITS):
+        self.max_bits = max_bits
+        self._values = OrderedDict()
+        self._keys = []
+        self._bits = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def nearest(self, n):
+        """(k, k!) for the largest cached k <= n, or (0, None); counts a hit when k == n"""
+        with self._lock:
+            index = bisect.bisect_right(self._keys, n)
+            if not index:
+                self.misses += 1
+                return 0, None
+            k = self._keys[index - 1]
+            if k == n:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._values.move_to_end(k)
+            return k, self._values[k]
+
+    def put(self, n, value):
+        bits = value.bit_length()
+        if bits > self.max_bits:
+            return
+        with self._lock:
+            if n in self._values:
+                return
+            self._values[n] = value
+            bisect.insort(self._keys, n)
+            self._bits += bits
+            while self._bits > self.max_bits:
+                k, old = self._values.popitem(last=False)
+                self._keys.remove(k)
+                self._bits -= old.bit_length()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._values), "bits": self._bits, "hits": self.hits, "misses": self.misses}
+
+
+workers = _WorkerPool()
+factorials = FactorialCache()
+
+
+def factorial(n):
+    """n! with a size guard, reusing cached factorials and offloading big ones"""
+    if n < 0:
+        raise ValueError("factorial is not defined for negative numbers")
+    bits = factorial_bits(n)
+    _check_size(bits, f"factorial({n})")
+    start, start_value = factorials.nearest(n)
+    if start == n and n:
+        return start_value
+    if start < n // 2:
+        # Too little to reuse; math.factorial's own algorithm is faster from scratch
+        start, start_value = 0, None
+    if bits <= INLINE_MAX_BITS:
+        value = _factorial_from(start, start_value, n)
+    else:
+        value = workers.run(_factorial_from, start, start_value, n)
+    factorials.put(n, value)
+    return value
+
+
+def power(base, exponent):
+    """base ** exponent with a size guard; big integer powers run in a worker process"""
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0:
+        bits = power_bits(base, exponent)
+        _check_size(bits, f"{base} ** {exponent}")
+        if bits > INLINE_MAX_BITS:
+            return workers.run(pow, base, exponent)
+    return base ** exponent
+
+
+def _leading_digits(number, digits):
+    """(digit count, first `digits` digits) of a positive Decimal"""
+    text = "".join(map(str, number.as_tuple().digits)).ljust(digits, "0")
+    return number.adjusted() + 1, text[:digits]
+
+
+def summarize(value, digits=SUMMARY_DIGITS):
+    """Digit count, leading and trailing digits of an integer without full decimal conversion"""
+    magnitude = abs(value)
+    if magnitude.bit_length() <= 4096:
+        text = str(magnitude)
+        count, leading = len(text), text[:digits]
+    else:
+        # magnitude lies in [top, top + 1) * 2**shift; evaluate both bounds to ~45 digits
+        shift = magnitude.bit_length() - 128
+        top = magnitude >> shift
+        floor = Context(prec=digits + 25, Emax=MAX_EMAX, rounding=ROUND_FLOOR)
+        ceiling = Context(prec=digits + 25, Emax=MAX_EMAX, rounding=ROUND_CEILING)
+        low = _leading_digits(floor.multiply(Decimal(top), floor.power(Decimal(2), shift)), digits)
+        high = _leading_digits(ceiling.multiply(Decimal(top + 1), ceiling.power(Decimal(2), shift)), digits)
+        count, leading = low
+        if low != high:
+            # The bounds straddle the point where the leading digits change; compare against it exactly
+            boundary = int(high[1]) * 10 ** (high[0] - len(high[1]))
+            if magnitude >= boundary:
+                count, leading = high
+    trailing = str(magnitude % 10 ** digits).zfill(min(digits, count))
+    return {
+        "sign": "-" if value < 0 else "+",
+        "digits": count,
+        "bits": magnitude.bit_length(),
+        "leading_digits": leading,
+        "trailing_digits": trailing
+    }
+
+
+def summarize_power(base, exponent, digits=SUMMARY_DIGITS):
+    """summarize(base ** exponent) from logarithms and modular powers, without computing the power"""
+    magnitude = abs(base)
+    context = Context(prec=digits + len(str(exponent)) + 10, Emax=MAX_EMAX)
+    log10 = context.multiply(Decimal(exponent), context.log10(Decimal(magnitude)))
+    whole = int(log10)
+    count, leading = _leading_digits(context.power(Decimal(10), log10 - whole), digits)
+    count += whole
+    log2 = context.divide(context.multiply(Decimal(exponent), context.ln(Decimal(magnitude))), context.ln(Decimal(2)))
+    return {
+        "sign": "-" if base < 0 and exponent % 2 else "+",
+        "digits": count,
+        "bits": int(log2) + 1,
+        "leading_digits": leading[:min(digits, count)],
+        "trailing_digits": str(pow(magnitude, exponent, 10 ** digits)).zfill(min(digits, count))
+    }
+
+
+def _check_output_size(bits, output):
+    """ValueError if an integer of this many bits is too big for the output form"""
+    if output == "hex" and bits / 4 > MAX_HEX_DIGITS:
+        raise ValueError(f"Result has about {int(bits / 4):,} hex digits; "
+                         f"use output='summary' above {MAX_HEX_DIGITS:,}")
+    if output in ("int", "full") and bits / LOG2_10 > MAX_DECIMAL_DIGITS:
+        raise ValueError(f"Result has about {int(bits / LOG2_10):,} digits; "
+                         f"use output='summary' or 'hex' above {MAX_DECIMAL_DIGITS:,}")
+
+
+def power_output(base, exponent, output="int"):
+    """base ** exponent in the requested output form; summaries of big powers skip the power itself"""
+    if output not in OUTPUT_FORMS:
+        raise ValueError(f"output must be one of {', '.join(OUTPUT_FORMS)}")
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base) > 1:
+        bits = power_bits(base, exponent)
+        if output == "summary" or (output == "auto" and bits / LOG2_10 > AUTO_FULL_DIGITS):
+            return summarize_power(base, exponent)
+        # Refuse before computing a power that could not be returned anyway
+        _check_output_size(bits, output)
+    return format_int(power(base, exponent), output)
+
+
+def factorial_output(n, output="int"):
+    """n! in the requested output form, refusing up front when it is too big for that form"""
+    if output not in OUTPUT_FORMS:
+        raise ValueError(f"output must be one of {', '.join(OUTPUT_FORMS)}")
+    if n > 1:
+        _check_output_size(factorial_bits(n), output)
+    return format_int(factorial(n), output)
+
+
+def format_int(value, output="int"):
+    """Render a big integer in the requested output form (non-integers are returned unchanged)"""
+    if output not in OUTPUT_FORMS:
+        raise ValueError(f"output must be one of {', '.join(OUTPUT_FORMS)}")
+    if not isinstance(value, int):
+        return value
+    if output == "summary":
+        return summarize(value)
+    if output == "auto":
+        return value if value.bit_length() / LOG2_10 <= AUTO_FULL_DIGITS else summarize(value)
+    _check_output_size(value.bit_length(), output)
+    if output == "hex":
+        return hex(value)
+    return value if output == "int" else str(value)
@@ -0,0 +1,209 @@
+import asyncio
+import io
+import logging
+import os
+import sys
+
+from PIL import Image as PILImage, ImageDraw, ImageFont
+
+logger = logging.getLogger("canvas_backends")
+
+# "paint" drives MS Paint on the Windows desktop; "pillow" draws on an in-memory image (any OS, no GUI)
+CANVAS_BACKEND = os.getenv("CANVAS_BACKEND", "paint" if sys.platform == "win32" else "pillow")
+CANVAS_SIZE = (int(os.getenv("CANVAS_WIDTH", "1280")), int(os.getenv("CANVAS_HEIGHT", "800")))
+
+
+class PaintCanvas:
+    """MS Paint driven through pywinauto; coordinates are tuned for one screen layout"""
+
+    # One Paint window on one desktop, so operations must not overlap
+    concurrent = False
+
+    def __init__(self):
+        self.app = None
+
+    @property
+    def is_open(self):
+        return self.app is not None
+
+    async def open(self):
+        # Windows-only modules, imported on first use so other backends run anywhere
+        from pywinauto.application import Application
+        import win32con
+        import win32gui
+
+        # Try different possible Paint paths
+        paint_paths = [
+            'mspaint.exe',  # Standard path
+            'C:\\Windows\\System32\\mspaint.exe',  # Full system path
+            'C:\\Windows\\SysWOW64\\mspaint.exe'   # 32-bit path
+        ]
+
+        for path in paint_paths:
+            try:
+                logger.info(f"Attempting to open Paint from: {path}")
+                self.app = Application().start(path)
+                await asyncio.sleep(1)  # Give Paint time to start
+
+                # Get the Paint window
+                paint_window = self.app.window(class_name='MSPaintApp')
+
+                # Wait for window to be ready (polls for up to 5s, so off the event loop)
+                await asyncio.to_thread(paint_window.wait, 'ready', timeout=5)
+
+                # Maximize the window
+                win32gui.ShowWindow(paint_window.handle, win32con.SW_MAXIMIZE)
+
+                logger.info("Paint opened successfully")
+                return "Paint opened successfully"
+            except Exception as e:
+                logger.warning(f"Failed to open Paint from {path}: {str(e)}")
+                continue
+
+        # If we get here, all paths failed
+        raise Exception("Could not open Paint from any known location")
+
+    async def draw_rectangle(self, x1, y1, x2, y2):
+        # Get the Paint window
+        paint_window = self.app.window(class_name='MSPaintApp')
+
+        # Ensure Paint window is active
+        if not paint_window.has_focus():
+            paint_window.set_focus()
+            await asyncio.sleep(0.3)
+
+        # Click on the Rectangle tool (adjusted coordinates)
+        paint_window.click_input(coords=(675, 120))  # Rectangle tool coordinates
+        await asyncio.sleep(0.2)
+        paint_window.click_input(coords=(675, 120))
+        await asyncio.sleep(0.5)
+
+        # Get the canvas area
+        canvas = paint_window.child_window(class_name='MSPaintView')
+
+        # Get the canvas rectangle to adjust coordinates
+        canvas_rect = canvas.rectangle()
+        canvas_left = canvas_rect.left
+        canvas_top = canvas_rect.top
+
+        # Adjust coordinates relative to canvas
+        # For ASUS Vivobook, we need to adjust the coordinates to account for:
+        # 1. The toolbar on the left (about 50 pixels)
+        # 2. The menu bar at the top (about 30 pixels)
+        # 3. The canvas offset from the window
+        adjusted_x1 = canvas_left + x1 + 50  # Increased offset for better visibility
+        adjusted_y1 = canvas_top + y1 + 50   # Increased offset for better visibility
+        adjusted_x2 = canvas_left + x2 + 100
+        adjusted_y2 = canvas_top + y2 + 100
+
+        # Draw rectangle using adjusted coordinates
+        # First click at starting position
+        paint_window.press_mouse_input(coords=(adjusted_x1, adjusted_y1))
+        await asyncio.sleep(0.3)
+        paint_window.move_mouse_input(coords=(adjusted_x2, adjusted_y2))
+        await asyncio.sleep(0.3)
+        # Click at end position to complete the rectangle
+        canvas.release_mouse_input(coords=(adjusted_x2, adjusted_y2))
+
+        return (f"Rectangle drawn from ({x1},{y1}) to ({x2},{y2}) with adjusted coordinates "
+                f"({adjusted_x1},{adjusted_y1}) to ({adjusted_x2},{adjusted_y2})")
+
+    async def add_text(self, text, x1, y1, x2, y2):
+        # Get the Paint window
+        paint_window = self.app.window(class_name='MSPaintApp')
+
+        # Ensure Paint window is active
+        if not paint_window.has_focus():
+            paint_window.set_focus()
+            await asyncio.sleep(0.5)
+
+        # Click on the Text tool in the Tools group (correct coordinates for text tool)
+        # The text tool is typically the 8th tool in the toolbar
+        paint_window.click_input(coords=(435, 120))  # Updated coordinates for text tool
+        await asyncio.sleep(0.5)
+
+        # Get the canvas area
+        canvas = paint_window.child_window(class_name='MSPaintView')
+
+        # Get the canvas rectangle to adjust coordinates
+        canvas_rect = canvas.rectangle()
+        canvas_left = canvas_rect.left
+        canvas_top = canvas_rect.top
+
+        # Calculate center coordinates based on the rectangle position
+        # Adjust coordinates similar to draw_rectangle
+        center_x = canvas_left + ((x1 + x2) // 2) + 100  # Middle of rectangle x coordinates
+        center_y = canvas_top + ((y1 + y2) // 2) + 100   # Middle of rectangle y coordinates
+
+        # Select text tool using keyboard shortcuts
+        paint_window.type_keys('t')
+        await asyncio.sleep(0.5)
+        paint_window.type_keys('x')
+        await asyncio.sleep(0.5)
+
+        # Click where to start typing (center of rectangle)
+        canvas.click_input(coords=(center_x, center_y))
+        await asyncio.sleep(0.5)
+
+        # Type the text
+        paint_window.type_keys(text)
+        await asyncio.sleep(0.5)
+
+        # Click outside to finish text input
+        canvas.click_input(coords=(center_x + 50, center_y + 50))
+
+        return f"Text '{text}' added successfully at center coordinates ({center_x}, {center_y})"
+
+    def png(self):
+        raise ValueError("The Paint backend draws on the desktop; set CANVAS_BACKEND=pillow for a PNG canvas")
+
+
+class PillowCanvas:
+    """Headless canvas: an in-memory RGB image, drawn in canvas coordinates with no GUI and no waits"""
+
+    # Every session has its own image and each operation finishes without yielding
+    concurrent = True
+
+    def __init__(self, size=CANVAS_SIZE):
+        self.size = size
+        self.image = None
+
+    @property
+    def is_open(self):
+        return self.image is not None
+
+    async def open(self):
+        self.image = PILImage.new("RGB", self.size, "white")
+        return "Paint opened successfully"
+
+    async def draw_rectangle(self, x1, y1, x2, y2):
+        box = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+        ImageDraw.Draw(self.image).rectangle(box, outline="black", width=2)
+        return f"Rectangle drawn from ({x1},{y1}) to ({x2},{y2})"
+
+    async def add_text(self, text, x1, y1, x2, y2):
+        draw = ImageDraw.Draw(self.image)
+        font = ImageFont.load_default()
+        center_x = (x1 + x2) // 2
+        center_y = (y1 + y2) // 2
+        left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+        draw.text((center_x - (right - left) // 2, center_y - (bottom - top) // 2), text, fill="black", font=font)
+        return f"Text '{text}' added successfully at center coordinates ({center_x}, {center_y})"
+
+    def png(self):
+        """The canvas encoded as PNG"""
+        if self.image is None:
+            raise ValueError("Paint is not open. Please call open_paint first.")
+        buffer = io.BytesIO()
+        self.image.save(buffer, "PNG")
+        return buffer.getvalue()
+
+
+BACKENDS = {"paint": PaintCanvas, "pillow": PillowCanvas}
+
+
+def backend_class(name=CANVAS_BACKEND):
+    """Canvas class for a backend name"""
+    if name not in BACKENDS:
+        raise ValueError(f"CANVAS_BACKEND must be one of {', '.join(BACKENDS)}")
+    return BACKENDS[name]
@@ -0,0 +1,74 @@
+from collections import Counter
+
+import numpy as np
+
+# Characters encoded per step; bounds working memory whatever the input size
+CHUNK_CHARS = 1 << 16
+# Largest page of values returned at once
+MAX_PAGE = 10000
+# Largest plain list returned when no page or aggregate is requested
+MAX_LIST = 100000
+MAX_HISTOGRAM_BINS = 1000
+
+ENCODINGS = {
+    # Unicode code points (what ord() returns), 4 bytes per character
+    "codepoints": ("utf-32-le", np.uint32),
+    # UTF-8 byte values, 1-4 per character
+    "utf-8": ("utf-8", np.uint8),
+}
+AGGREGATES = ("count", "sum", "min", "max", "histogram")
+
+
+def _codes(text, encoding):
+    """Code array viewed directly over the encoded bytes (no per-character Python ints)"""
+    codec, dtype = ENCODINGS[encoding]
+    return np.frombuffer(text.encode(codec, "surrogatepass"), dtype=dtype)
+
+
+def _chunks(string, encoding):
+    """Code arrays for consecutive CHUNK_CHARS slices of the string"""
+    for start in range(0, len(string), CHUNK_CHARS):
+        yield _codes(string[start:start + CHUNK_CHARS], encoding)
+
+
+def page(string, encoding="codepoints", offset=0, limit=MAX_PAGE):
+    """(values, total) for codes offset..offset+limit-1; total is the number of codes in the string"""
+    if encoding not in ENCODINGS:
+        raise ValueError(f"encoding must be one of {', '.join(ENCODINGS)}")
+    offset, limit = max(offset, 0), max(limit, 0)
+    if encoding == "codepoints":
+        # One code per character, so the page is a plain slice
+        return _codes(string[offset:offset + limit], encoding).tolist(), len(string)
+    values = []
+    position = 0
+    for codes in _chunks(string, encoding):
+        end = position + len(codes)
+        if len(values) < limit and end > offset:
+            values.extend(codes[max(offset - position, 0):][:limit - len(values)].tolist())
+        position = end
+    return values, position
+
+
+def aggregate(string, encoding="codepoints", which=AGGREGATES):
+    """Requested aggregates over all codes, computed chunk by chunk"""
+    if encoding not in ENCODINGS:
+        raise ValueError(f"encoding must be one of {', '.join(ENCODINGS)}")
+    unknown = set(which) - set(AGGREGATES)
+    if unknown:
+        raise ValueError(f"Unknown aggregates: {', '.join(sorted(unknown))}; use {', '.join(AGGREGATES)}")
+    count = total = 0
+    low = high = None
+    histogram = Counter()
+    for codes in _chunks(string, encoding):
+        count += len(codes)
+        total += int(codes.sum(dtype=np.uint64))
+        low = int(codes.min()) if low is None else min(low, int(codes.min()))
+        high = int(codes.max()) if high is None else max(high, int(codes.max()))
+        if "histogram" in which:
+            values, counts = np.unique(codes, return_counts=True)
+            histogram.update(dict(zip(values.tolist(), counts.tolist())))
+    result = {"count": count, "sum": total, "min": low, "max": high}
+    result = {name: result[name] for name in which if name != "histogram"}
+    if "histogram" in which:
+        result["histogram"] = {str(code): n for code, n in histogram.most_common(MAX_HISTOGRAM_BINS)}
+    return result
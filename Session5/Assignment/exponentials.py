@@ -0,0 +1,43 @@
+import base64
+
+import numpy as np
+
+# Element types accepted for base64-encoded little-endian input arrays
+ARRAY_DTYPES = {"int8", "int16", "int32", "int64", "uint8", "uint16", "uint32", "float32", "float64"}
+MAX_ELEMENTS = 50_000_000
+
+
+def to_array(int_list=None, data=None, dtype="int64"):
+    """float64 array from a JSON list or from base64-encoded raw little-endian `dtype` values"""
+    if data is not None:
+        if dtype not in ARRAY_DTYPES:
+            raise ValueError(f"dtype must be one of {', '.join(sorted(ARRAY_DTYPES))}")
+        raw = base64.b64decode(data, validate=True)
+        item_size = np.dtype(dtype).itemsize
+        if len(raw) % item_size:
+            raise ValueError(f"Data length {len(raw)} is not a multiple of the {dtype} size ({item_size} bytes)")
+        values = np.frombuffer(raw, dtype=np.dtype(dtype).newbyteorder("<"))
+    else:
+        values = np.asarray(int_list if int_list is not None else [], dtype=np.float64)
+    if values.ndim != 1 or values.size > MAX_ELEMENTS:
+        raise ValueError(f"Expected a flat list of at most {MAX_ELEMENTS:,} numbers")
+    return values.astype(np.float64, copy=False)
+
+
+def log_sum_exp(values):
+    """log(sum(exp(values))) without overflow, by factoring out the largest value"""
+    if not values.size:
+        return float("-inf")
+    peak = values.max()
+    if not np.isfinite(peak):
+        return float(peak)
+    return float(peak + np.log(np.exp(values - peak).sum()))
+
+
+def exp_sum(values):
+    """sum(exp(values)); ValueError if the sum does not fit in a float"""
+    with np.errstate(over="ignore"):
+        total = np.exp(values).sum()
+    if np.isinf(total):
+        raise ValueError(f"Sum of exponentials overflows (log of the sum is {log_sum_exp(values):.6g}); use log=True")
+    return float(total)
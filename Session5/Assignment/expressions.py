@@ -0,0 +1,91 @@
+import ast
+import math
+import operator
+from functools import lru_cache
+
+# Largest integer power result (in bits) and factorial argument an expression may produce,
+# so one call cannot stall the server
+MAX_RESULT_BITS = 1 << 20
+MAX_FACTORIAL = 5000
+
+
+def _pow(base, exponent):
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base) > 1:
+        if (abs(base).bit_length() - 1) * exponent > MAX_RESULT_BITS:
+            raise ValueError(f"Power result would exceed {MAX_RESULT_BITS} bits")
+    return operator.pow(base, exponent)
+
+
+def _factorial(n):
+    if n > MAX_FACTORIAL:
+        raise ValueError(f"factorial({n}) is too large (max {MAX_FACTORIAL})")
+    return math.factorial(n)
+
+
+# Functions and constants an expression may refer to, matching the server's math tools
+FUNCTIONS = {
+    "sqrt": math.sqrt,
+    "cbrt": lambda a: math.copysign(abs(a) ** (1 / 3), a),
+    "factorial": _factorial,
+    "log": math.log,
+    "exp": math.exp,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "abs": abs,
+    "min": min,
+    "max": max,
+    "round": round,
+    "_pow": _pow,
+}
+CONSTANTS = {"pi": math.pi, "e": math.e}
+
+ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.USub, ast.UAdd,
+)
+
+
+class _GuardPower(ast.NodeTransformer):
+    """Rewrite `a ** b` into a bounded _pow(a, b) call"""
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Pow):
+            return ast.copy_location(ast.Call(ast.Name("_pow", ast.Load()), [node.left, node.right], []), node)
+        return node
+
+
+@lru_cache(maxsize=512)
+def compile_expression(source):
+    """Validate an expression against the whitelist and compile it; returns (code, variable names)"""
+    tree = ast.parse(source.strip(), mode="eval")
+    names = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ValueError(f"Unsupported syntax: {type(node).__name__}")
+        if isinstance(node, ast.Constant) and (isinstance(node.value, bool) or not isinstance(node.value, (int, float))):
+            raise ValueError(f"Unsupported constant: {node.value!r}")
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+                raise ValueError(f"Unsupported function call: {ast.unparse(node.func)}")
+        elif isinstance(node, ast.Name) and node.id not in FUNCTIONS:
+            names.add(node.id)
+    tree = ast.fix_missing_locations(_GuardPower().visit(tree))
+    return compile(tree, "<expression>", "eval"), frozenset(names - CONSTANTS.keys())
+
+
+def evaluate(source, variables=None):
+    """Evaluate an arithmetic expression with optional variable bindings"""
+    code, names = compile_expression(source)
+    variables = variables or {}
+    missing = sorted(names - variables.keys())
+    if missing:
+        raise ValueError(f"Unbound variables: {', '.join(missing)}")
+    namespace = dict(CONSTANTS)
+    for name in names:
+        value = variables[name]
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"Variable {name} must be a number")
+        namespace[name] = value
+    return eval(code, {"__builtins__": {}, **FUNCTIONS}, namespace)
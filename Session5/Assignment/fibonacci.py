@@ -0,0 +1,109 @@
+import threading
+from collections import OrderedDict
+
+# Fibonacci numbers kept in the shared prefix table (F(10000) has about 2,100 digits)
+MAX_PREFIX = 10000
+# Largest index served at all; F(200000) has about 41,800 digits
+MAX_INDEX = 200000
+# Most values returned by one range page
+MAX_PAGE = 1000
+# Total size of the values in one page; late pages hold fewer, bigger numbers (about 315,000 digits in all)
+MAX_PAGE_BITS = 1 << 20
+# (F(k), F(k+1)) pairs remembered at page boundaries so the next page continues from them
+MAX_CHECKPOINTS = 64
+
+
+def fib_pair(n):
+    """(F(n), F(n+1)) by fast doubling in O(log n) big-integer multiplications"""
+    a, b = 0, 1
+    for bit in bin(n)[2:]:
+        # F(2k) = F(k) * (2F(k+1) - F(k)), F(2k+1) = F(k)^2 + F(k+1)^2
+        c = a * (2 * b - a)
+        d = a * a + b * b
+        a, b = (d, c + d) if bit == '1' else (c, d)
+    return a, b
+
+
+class FibonacciTable:
+    """Shared, incrementally grown prefix of the Fibonacci sequence plus page checkpoints"""
+
+    def __init__(self, max_prefix=MAX_PREFIX, max_checkpoints=MAX_CHECKPOINTS):
+        self.max_prefix = max_prefix
+        self.max_checkpoints = max_checkpoints
+        self._values = [0, 1]
+        self._checkpoints = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_index(self, n):
+        if n < 0 or n > MAX_INDEX:
+            raise ValueError(f"Fibonacci index must be between 0 and {MAX_INDEX}")
+
+    def prefix(self, n):
+        """The first n Fibonacci numbers, extending the shared table only past what it already holds"""
+        if n > self.max_prefix:
+            raise ValueError(f"At most {self.max_prefix} numbers can be listed at once; use a range page")
+        values = self._values
+        if n > len(values):
+            with self._lock:
+                values = self._values
+                while len(values) < n:
+                    values.append(values[-1] + values[-2])
+        return values[:max(n, 0)]
+
+    def _pair(self, n):
+        """(F(n), F(n+1)) from the table, a checkpoint, or fast doubling"""
+        values = self._values
+        if n + 1 < len(values):
+            return values[n], values[n + 1]
+        with self._lock:
+            pair = self._checkpoints.get(n)
+            if pair is not None:
+                self._checkpoints.move_to_end(n)
+                return pair
+        return fib_pair(n)
+
+    def _remember(self, n, pair):
+        with self._lock:
+            self._checkpoints[n] = pair
+            self._checkpoints.move_to_end(n)
+            while len(self._checkpoints) > self.max_checkpoints:
+                self._checkpoints.popitem(last=False)
+
+    def at(self, n):
+        """F(n)"""
+        self._check_index(n)
+        return self._pair(n)[0]
+
+    def range(self, start, count):
+        """[F(start), ..., F(start + count - 1)], clipped to MAX_PAGE values, MAX_PAGE_BITS and MAX_INDEX.
+
+        Holds at least one value (if any are left); the next page starts at start + len(page).
+        """
+        self._check_index(start)
+        count = max(0, min(count, MAX_PAGE, MAX_INDEX + 1 - start))
+        end = start + count
+        if end <= len(self._values):
+            page = self._values[start:end]
+            return page[:_page_length(page)]
+        a, b = self._pair(start)
+        page = []
+        bits = 0
+        for _ in range(count):
+            bits += a.bit_length()
+            if page and bits > MAX_PAGE_BITS:
+                break
+            page.append(a)
+            a, b = b, a + b
+        # The next page (start + len(page)) resumes from here instead of recomputing
+        self._remember(start + len(page), (a, b))
+        return page
+
+
+def _page_length(values):
+    """How many leading values fit in MAX_PAGE_BITS (at least one)"""
+    bits = 0
+    for length, value in enumerate(values):
+        bits += value.bit_length()
+        if length and bits > MAX_PAGE_BITS:
+            return length
+    return len(values)
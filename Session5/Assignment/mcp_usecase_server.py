@@ -3,362 +3,313 @@ from mcp.server.fastmcp import FastMCP, Image
 from mcp.server.fastmcp.prompts import base
 from mcp.types import TextContent
 from mcp import types
-from PIL import Image as PILImage
+import json
+import logging
 import math
+import os
 import sys
-from pywinauto.application import Application
-import win32gui
-import win32con
-import time
-from win32api import GetSystemMetrics
-
-# Global variable to store Paint application instance
-paint_app = None
+import bignum
+import canvas_backends
+import char_codes
+from exponentials import exp_sum, log_sum_exp, to_array
+from expressions import evaluate
+from fibonacci import MAX_INDEX, FibonacciTable
+import thumbnails
+from tool_runtime import SessionState, ToolRuntime
+
+# Shared Fibonacci prefix table, reused across calls
+fibonacci_table = FibonacciTable()
+
+# Big results (e.g. F(200000)) are returned as decimal text, above Python's default 4300-digit limit
+if hasattr(sys, "set_int_max_str_digits"):
+    sys.set_int_max_str_digits(bignum.MAX_DECIMAL_DIGITS)
+
+# stdout carries the JSON-RPC stream under the stdio transport, so logs go to stderr or MCP_LOG_FILE
+log_file = os.getenv("MCP_LOG_FILE")
+logging.basicConfig(
+    **({"filename": log_file} if log_file else {"stream": sys.stderr}),
+    level=os.getenv("MCP_LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger("mcp_usecase_server")
+
+# Transports: stdio (one client, spawned per run) or sse / streamable-http, where one long-lived
+# process on MCP_HOST:MCP_PORT serves many concurrent client sessions
+TRANSPORTS = ("stdio", "sse", "streamable-http")
 
 # instantiate an MCP server client
-mcp = FastMCP("Calculator")
+mcp = FastMCP(
+    "Calculator",
+    host=os.getenv("MCP_HOST", "127.0.0.1"),
+    port=int(os.getenv("MCP_PORT", "8000"))
+)
+
+# Tools are registered through the runtime so every call is timed and counted (see metrics://tools);
+# tools marked pure=True (no side effects, result depends only on the arguments) share an LRU result cache.
+# The Paint tools act on the desktop and must never be marked pure.
+# Sync tools run on the runtime's thread pool so a slow call does not block other requests;
+# the desktop Paint backend drives one shared window, so its tools run one at a time.
+runtime = ToolRuntime(mcp)
+tool = runtime.tool
+PAINT_TIMEOUT = 30
+
+# Drawing tools go through a canvas backend (CANVAS_BACKEND): MS Paint on the desktop, or a headless
+# in-memory Pillow canvas; each client session gets its own canvas
+Canvas = canvas_backends.backend_class()
+canvas_sessions = SessionState(mcp, Canvas)
+PAINT_CONCURRENCY = None if Canvas.concurrent else 1
 
 # DEFINE TOOLS
 
 #addition tool
-@mcp.tool()
+@tool(pure=True)
 def add(a: int, b: int) -> int:
     """Add two numbers"""
-    print("CALLED: add(a: int, b: int) -> int:")
     return f"FINAL_ANSWER: [{int(a + b)}]"
 
-@mcp.tool()
+@tool(pure=True)
 def add_list(l: list) -> int:
     """Add all numbers in a list"""
-    print("CALLED: add(l: list) -> int:")
     return sum(l)
 
 # subtraction tool
-@mcp.tool()
+@tool(pure=True)
 def subtract(a: int, b: int) -> int:
     """Subtract two numbers"""
-    print("CALLED: subtract(a: int, b: int) -> int:")
     return int(a - b)
 
 # multiplication tool
-@mcp.tool()
+@tool(pure=True)
 def multiply(a: int, b: int) -> int:
     """Multiply two numbers"""
-    print("CALLED: multiply(a: int, b: int) -> int:")
     return int(a * b)
 
 #  division tool
-@mcp.tool() 
+@tool(pure=True)
 def divide(a: int, b: int) -> float:
     """Divide two numbers"""
-    print("CALLED: divide(a: int, b: int) -> float:")
     return float(a / b)
 
 # power tool
-@mcp.tool()
-def power(a: int, b: int) -> int:
-    """Power of two numbers"""
-    print("CALLED: power(a: int, b: int) -> int:")
-    return int(a ** b)
+@tool(pure=True)
+def power(a: int, b: int, output: str = "int") -> int | str | dict:
+    """Power of two numbers. Optional output: "int" (the number, default), "full" (decimal text),
+    "summary" (digit count with leading/trailing digits), "hex", or "auto" (summary when huge)"""
+    return bignum.power_output(a, b, output)
 
 # square root tool
-@mcp.tool()
+@tool(pure=True)
 def sqrt(a: int) -> float:
     """Square root of a number"""
-    print("CALLED: sqrt(a: int) -> float:")
     return float(a ** 0.5)
 
 # cube root tool
-@mcp.tool()
+@tool(pure=True)
 def cbrt(a: int) -> float:
     """Cube root of a number"""
-    print("CALLED: cbrt(a: int) -> float:")
     return float(a ** (1/3))
 
 # factorial tool
-@mcp.tool()
-def factorial(a: int) -> int:
-    """factorial of a number"""
-    print("CALLED: factorial(a: int) -> int:")
-    return int(math.factorial(a))
+@tool(pure=True)
+def factorial(a: int, output: str = "int") -> int | str | dict:
+    """factorial of a number. Optional output: "int" (the number, default), "full" (decimal text),
+    "summary" (digit count with leading/trailing digits), "hex", or "auto" (summary when huge)"""
+    return bignum.factorial_output(a, output)
 
 # log tool
-@mcp.tool()
+@tool(pure=True)
 def log(a: int) -> float:
     """log of a number"""
-    print("CALLED: log(a: int) -> float:")
     return float(math.log(a))
 
 # remainder tool
-@mcp.tool()
+@tool(pure=True)
 def remainder(a: int, b: int) -> int:
     """remainder of two numbers divison"""
-    print("CALLED: remainder(a: int, b: int) -> int:")
     return int(a % b)
 
 # sin tool
-@mcp.tool()
+@tool(pure=True)
 def sin(a: int) -> float:
     """sin of a number"""
-    print("CALLED: sin(a: int) -> float:")
     return float(math.sin(a))
 
 # cos tool
-@mcp.tool()
+@tool(pure=True)
 def cos(a: int) -> float:
     """cos of a number"""
-    print("CALLED: cos(a: int) -> float:")
     return float(math.cos(a))
 
 # tan tool
-@mcp.tool()
+@tool(pure=True)
 def tan(a: int) -> float:
     """tan of a number"""
-    print("CALLED: tan(a: int) -> float:")
     return float(math.tan(a))
 
 # mine tool
-@mcp.tool()
+@tool(pure=True)
 def mine(a: int, b: int) -> int:
     """special mining tool"""
-    print("CALLED: mine(a: int, b: int) -> int:")
     return int(a - b - b)
 
-@mcp.tool()
-def create_thumbnail(image_path: str) -> Image:
-    """Create a thumbnail from an image"""
-    print("CALLED: create_thumbnail(image_path: str) -> Image:")
-    img = PILImage.open(image_path)
-    img.thumbnail((100, 100))
-    return Image(data=img.tobytes(), format="png")
-
-@mcp.tool()
-def strings_to_chars_to_int(string: str) -> list[int]:
-    """Return the ASCII values of the characters in a word"""
-    print("CALLED: strings_to_chars_to_int(string: str) -> list[int]:")
-    return [int(ord(char)) for char in string]
-
-@mcp.tool()
-def int_list_to_exponential_sum(int_list: list) -> float:
-    """Return sum of exponentials of numbers in a list"""
-    print("CALLED: int_list_to_exponential_sum(int_list: list) -> float:")
-    return sum(math.exp(i) for i in int_list)
-
-@mcp.tool()
+# Operations available to batch_compute, one entry per math tool above
+# (add is listed by value; the tool itself wraps its result in FINAL_ANSWER)
+OPERATIONS = {
+    "add": lambda a, b: int(a + b),
+    "add_list": add_list,
+    "subtract": subtract,
+    "multiply": multiply,
+    "divide": divide,
+    "power": power,
+    "sqrt": sqrt,
+    "cbrt": cbrt,
+    "factorial": factorial,
+    "log": log,
+    "remainder": remainder,
+    "sin": sin,
+    "cos": cos,
+    "tan": tan,
+    "mine": mine,
+}
+MAX_BATCH_ITEMS = 200
+
+# batch tool
+@tool(pure=True)
+def batch_compute(items: list) -> list:
+    """Run many math operations in one call. items: [{"op": "add", "args": [2, 3]}, ...];
+    args may be a list or a dict of named arguments. Returns one {"op", "result"} or
+    {"op", "error"} entry per item, in order"""
+    if len(items) > MAX_BATCH_ITEMS:
+        raise ValueError(f"At most {MAX_BATCH_ITEMS} items per batch")
+    results = []
+    for item in items:
+        op = item.get("op") if isinstance(item, dict) else None
+        try:
+            if op not in OPERATIONS:
+                raise ValueError(f"Unknown operation: {op}")
+            args = item.get("args", [])
+            value = OPERATIONS[op](**args) if isinstance(args, dict) else OPERATIONS[op](*args)
+            results.append({"op": op, "result": value})
+        except Exception as e:
+            results.append({"op": op, "error": f"{type(e).__name__}: {e}"})
+    return results
+
+# expression tool
+@tool(pure=True)
+def evaluate_expression(expression: str, variables: dict = None) -> float:
+    """Evaluate a whole arithmetic expression in one call, e.g. "(45 + 44) * 2 ** 3 - sqrt(x)".
+    Supports + - * / // % **, sqrt, cbrt, factorial, log, exp, sin, cos, tan, abs, min, max,
+    round, pi, e and variables bound through `variables` (e.g. {"x": 16})"""
+    return evaluate(expression, variables)
+
+@tool()
+def create_thumbnail(image_path: str, format: str = "png") -> Image:
+    """Create a thumbnail from an image (format: "png" or "webp")"""
+    data, _ = thumbnails.thumbnail(image_path, fmt=format)
+    return Image(data=data, format=format)
+
+@tool()
+def create_thumbnails(image_paths: list, format: str = "png") -> list:
+    """Create thumbnails for many images at once (format: "png" or "webp"). Returns, per image,
+    the path of its cached thumbnail file or an error"""
+    return thumbnails.thumbnails(image_paths, fmt=format)
+
+@tool(pure=True)
+def strings_to_chars_to_int(string: str, encoding: str = "codepoints", offset: int = 0,
+                            limit: int = None, aggregates: list = None) -> list[int] | dict:
+    """Return the ASCII values of the characters in a word. encoding: "codepoints" (ord of each
+    character) or "utf-8" (byte values). For long texts pass limit/offset to page through the
+    values, and/or aggregates (any of count, sum, min, max, histogram) to get totals instead"""
+    if limit is None and not aggregates and not offset:
+        values, total = char_codes.page(string, encoding, 0, char_codes.MAX_LIST)
+        if total > len(values):
+            raise ValueError(f"Text has {total} values; use limit/offset (pages of up to "
+                             f"{char_codes.MAX_PAGE}) or aggregates")
+        return values
+    result = {"encoding": encoding}
+    if limit is not None or offset:
+        values, total = char_codes.page(string, encoding, offset, min(limit or char_codes.MAX_PAGE, char_codes.MAX_PAGE))
+        next_offset = offset + len(values)
+        result.update(offset=offset, values=values, total=total,
+                      next_offset=next_offset if next_offset < total else None)
+    if aggregates:
+        result.update(char_codes.aggregate(string, encoding, aggregates))
+    return result
+
+@tool(pure=True)
+def int_list_to_exponential_sum(int_list: list = None, data: str = None, dtype: str = "int64",
+                                log: bool = False) -> float:
+    """Return sum of exponentials of numbers in a list. Large inputs can be sent as `data`:
+    base64 of little-endian `dtype` values (int8..int64, uint8..uint32, float32, float64).
+    With log=True returns log(sum(exp(x))), which does not overflow for big numbers"""
+    values = to_array(int_list, data, dtype)
+    return log_sum_exp(values) if log else exp_sum(values)
+
+@tool(pure=True)
 def fibonacci_numbers(n: int) -> list:
     """Return the first n Fibonacci Numbers"""
-    print("CALLED: fibonacci_numbers(n: int) -> list:")
     if n <= 0:
         return []
-    fib_sequence = [0, 1]
-    for _ in range(2, n):
-        fib_sequence.append(fib_sequence[-1] + fib_sequence[-2])
-    return fib_sequence[:n]
+    return fibonacci_table.prefix(n)
+
+@tool(pure=True)
+def fibonacci_at(n: int) -> str:
+    """Return the n-th Fibonacci number (F(0) = 0, F(1) = 1) as a decimal string"""
+    return str(fibonacci_table.at(n))
+
+@tool(pure=True)
+def fibonacci_range(start: int, count: int) -> dict:
+    """Return one page of Fibonacci numbers F(start)..F(start + count - 1) as decimal strings
+    (at most 1000 per page, fewer once the numbers get big); fetch the next page with start=next_start"""
+    values = fibonacci_table.range(start, count)
+    next_start = start + len(values)
+    return {
+        "start": start,
+        "values": [str(value) for value in values],
+        "next_start": next_start if values and next_start <= MAX_INDEX else None
+    }
+
+def text_result(text):
+    return {
+        "content": [
+            TextContent(
+                type="text",
+                text=text
+            )
+        ]
+    }
 
-@mcp.tool()
+@tool(concurrency=PAINT_CONCURRENCY, group="paint", timeout=PAINT_TIMEOUT)
 async def open_paint() -> dict:
     """Open Microsoft Paint"""
-    global paint_app
     try:
-        # Try different possible Paint paths
-        paint_paths = [
-            'mspaint.exe',  # Standard path
-            'C:\\Windows\\System32\\mspaint.exe',  # Full system path
-            'C:\\Windows\\SysWOW64\\mspaint.exe'   # 32-bit path
-        ]
-        
-        for path in paint_paths:
-            try:
-                print(f"Attempting to open Paint from: {path}")
-                paint_app = Application().start(path)
-                time.sleep(1)  # Give Paint time to start
-                
-                # Get the Paint window
-                paint_window = paint_app.window(class_name='MSPaintApp')
-                
-                # Wait for window to be ready
-                paint_window.wait('ready', timeout=5)
-                
-                # Maximize the window
-                win32gui.ShowWindow(paint_window.handle, win32con.SW_MAXIMIZE)
-                
-                print("Paint opened successfully")
-                return {
-                    "content": [
-                        TextContent(
-                            type="text",
-                            text="Paint opened successfully"
-                        )
-                    ]
-                }
-            except Exception as e:
-                print(f"Failed to open Paint from {path}: {str(e)}")
-                continue
-        
-        # If we get here, all paths failed
-        raise Exception("Could not open Paint from any known location")
-        
+        return text_result(await canvas_sessions.get().open())
     except Exception as e:
         error_msg = f"Error opening Paint: {str(e)}"
-        print(error_msg)
-        return {
-            "content": [
-                TextContent(
-                    type="text",
-                    text=error_msg
-                )
-            ]
-        }
-
-@mcp.tool()
+        logger.error(error_msg)
+        return text_result(error_msg)
+
+@tool(concurrency=PAINT_CONCURRENCY, group="paint", timeout=PAINT_TIMEOUT)
 async def draw_rectangle(x1: int, y1: int, x2: int, y2: int) -> dict:
     """Draw a rectangle in Paint from (x1,y1) to (x2,y2)"""
-    global paint_app
+    canvas = canvas_sessions.get()
+    if not canvas.is_open:
+        return text_result("Paint is not open. Please call open_paint first.")
     try:
-        if not paint_app:
-            return {
-                "content": [
-                    TextContent(
-                        type="text",
-                        text="Paint is not open. Please call open_paint first."
-                    )
-                ]
-            }
-        
-        # Get the Paint window
-        paint_window = paint_app.window(class_name='MSPaintApp')
-        
-        # Ensure Paint window is active
-        if not paint_window.has_focus():
-            paint_window.set_focus()
-            time.sleep(0.3)
-        
-        # Click on the Rectangle tool (adjusted coordinates)
-        paint_window.click_input(coords=(675, 120))  # Rectangle tool coordinates
-        time.sleep(0.2)
-        paint_window.click_input(coords=(675, 120))
-        time.sleep(0.5)
-        
-        # Get the canvas area
-        canvas = paint_window.child_window(class_name='MSPaintView')
-        
-        # Get the canvas rectangle to adjust coordinates
-        canvas_rect = canvas.rectangle()
-        canvas_left = canvas_rect.left
-        canvas_top = canvas_rect.top
-        
-        # Adjust coordinates relative to canvas
-        # For ASUS Vivobook, we need to adjust the coordinates to account for:
-        # 1. The toolbar on the left (about 50 pixels)
-        # 2. The menu bar at the top (about 30 pixels)
-        # 3. The canvas offset from the window
-        adjusted_x1 = canvas_left + x1 + 50  # Increased offset for better visibility
-        adjusted_y1 = canvas_top + y1 + 50   # Increased offset for better visibility
-        adjusted_x2 = canvas_left + x2 + 100
-        adjusted_y2 = canvas_top + y2 + 100
-        
-        # Draw rectangle using adjusted coordinates
-        # First click at starting position
-        paint_window.press_mouse_input(coords=(adjusted_x1, adjusted_y1))
-        time.sleep(0.3)
-        paint_window.move_mouse_input(coords=(adjusted_x2, adjusted_y2))
-        time.sleep(0.3)
-        # Click at end position to complete the rectangle
-        canvas.release_mouse_input(coords=(adjusted_x2, adjusted_y2))
-        
-        return {
-            "content": [
-                TextContent(
-                    type="text",
-                    text=f"Rectangle drawn from ({x1},{y1}) to ({x2},{y2}) with adjusted coordinates ({adjusted_x1},{adjusted_y1}) to ({adjusted_x2},{adjusted_y2})"
-                )
-            ]
-        }
+        return text_result(await canvas.draw_rectangle(x1, y1, x2, y2))
     except Exception as e:
-        return {
-            "content": [
-                TextContent(
-                    type="text",
-                    text=f"Error drawing rectangle: {str(e)}"
-                )
-            ]
-        }
-
-@mcp.tool()
+        return text_result(f"Error drawing rectangle: {str(e)}")
+
+@tool(concurrency=PAINT_CONCURRENCY, group="paint", timeout=PAINT_TIMEOUT)
 async def add_text_in_paint(text: str, x1: int, y1: int, x2: int, y2: int) -> dict:
     """Add text in Paint at the center of the specified rectangle coordinates"""
-    global paint_app
+    canvas = canvas_sessions.get()
+    if not canvas.is_open:
+        return text_result("Paint is not open. Please call open_paint first.")
     try:
-        if not paint_app:
-            return {
-                "content": [
-                    TextContent(
-                        type="text",
-                        text="Paint is not open. Please call open_paint first."
-                    )
-                ]
-            }
-        
-        # Get the Paint window
-        paint_window = paint_app.window(class_name='MSPaintApp')
-        
-        # Ensure Paint window is active
-        if not paint_window.has_focus():
-            paint_window.set_focus()
-            time.sleep(0.5)
-        
-        # Click on the Text tool in the Tools group (correct coordinates for text tool)
-        # The text tool is typically the 8th tool in the toolbar
-        paint_window.click_input(coords=(435, 120))  # Updated coordinates for text tool
-        time.sleep(0.5)
-        
-        # Get the canvas area
-        canvas = paint_window.child_window(class_name='MSPaintView')
-        
-        # Get the canvas rectangle to adjust coordinates
-        canvas_rect = canvas.rectangle()
-        canvas_left = canvas_rect.left
-        canvas_top = canvas_rect.top
-        
-        # Calculate center coordinates based on the rectangle position
-        # Adjust coordinates similar to draw_rectangle
-        center_x = canvas_left + ((x1 + x2) // 2) + 100  # Middle of rectangle x coordinates
-        center_y = canvas_top + ((y1 + y2) // 2) + 100   # Middle of rectangle y coordinates
-        
-        # Select text tool using keyboard shortcuts
-        paint_window.type_keys('t')
-        time.sleep(0.5)
-        paint_window.type_keys('x')
-        time.sleep(0.5)
-        
-        # Click where to start typing (center of rectangle)
-        canvas.click_input(coords=(center_x, center_y))
-        time.sleep(0.5)
-        
-        # Type the text
-        paint_window.type_keys(text)
-        time.sleep(0.5)
-        
-        # Click outside to finish text input
-        canvas.click_input(coords=(center_x + 50, center_y + 50))
-        
-        return {
-            "content": [
-                TextContent(
-                    type="text",
-                    text=f"Text '{text}' added successfully at center coordinates ({center_x}, {center_y})"
-                )
-            ]
-        }
+        return text_result(await canvas.add_text(text, x1, y1, x2, y2))
     except Exception as e:
-        return {
-            "content": [
-                TextContent(
-                    type="text",
-                    text=f"Error adding text: {str(e)}"
-                )
-            ]
-        }
+        return text_result(f"Error adding text: {str(e)}")
 
 # DEFINE RESOURCES
 
@@ -366,15 +317,27 @@ async def add_text_in_paint(text: str, x1: int, y1: int, x2: int, y2: int) -> di
 @mcp.resource("greeting://{name}")
 def get_greeting(name: str) -> str:
     """Get a personalized greeting"""
-    print("CALLED: get_greeting(name: str) -> str:")
     return f"Hello, {name}!"
 
 
+# The calling session's canvas as PNG (headless Pillow backend only)
+@mcp.resource("canvas://current.png", mime_type="image/png")
+def canvas_png() -> bytes:
+    """The rendered drawing of the calling session"""
+    return canvas_sessions.get().png()
+
+
+# Per-tool call counts, errors, cache hits, wall/CPU time and payload sizes
+@mcp.resource("metrics://tools")
+def tool_metrics() -> str:
+    """Call statistics for every tool, slowest (by total wall time) first, and result cache stats"""
+    return json.dumps(runtime.snapshot(), indent=2)
+
+
 # DEFINE AVAILABLE PROMPTS
 @mcp.prompt()
 def review_code(code: str) -> str:
     return f"Please review this code:\n\n{code}"
-    print("CALLED: review_code(code: str) -> str:")
 
 
 @mcp.prompt()
@@ -387,8 +350,14 @@ def debug_error(error: str) -> list[base.Message]:
 
 if __name__ == "__main__":
     # Check if running with mcp dev command
-    print("STARTING")
+    logger.info("STARTING")
     if len(sys.argv) > 1 and sys.argv[1] == "dev":
         mcp.run()  # Run without transport for dev server
     else:
-        mcp.run(transport="stdio")  # Run with stdio for direct execution
+        # python mcp_usecase_server.py [stdio|sse|streamable-http], or MCP_TRANSPORT
+        transport = sys.argv[1] if len(sys.argv) > 1 else os.getenv("MCP_TRANSPORT", "stdio")
+        if transport not in TRANSPORTS:
+            sys.exit(f"Unknown transport {transport!r}; use one of {', '.join(TRANSPORTS)}")
+        if transport != "stdio":
+            logger.info(f"Serving {transport} on {mcp.settings.host}:{mcp.settings.port}")
+        mcp.run(transport=transport)
@@ -3,6 +3,8 @@ from dotenv import load_dotenv
 from mcp import ClientSession, StdioServerParameters, types
 from mcp.client.stdio import stdio_client
 import asyncio
+import ast
+from contextlib import asynccontextmanager
 # from google import genai
 from concurrent.futures import TimeoutError
 from functools import partial
@@ -21,6 +23,8 @@ api_key = os.getenv("GEMINI_API_KEY")
 client = genai.configure(api_key=api_key)
 model = genai.GenerativeModel("gemini-2.0-flash")
 max_iterations = 7
+# e.g. http://127.0.0.1:8000/mcp (streamable HTTP) or http://127.0.0.1:8000/sse; unset spawns a stdio server
+server_url = os.getenv("MCP_SERVER_URL")
 last_response = None
 iteration = 0
 iteration_response = []
@@ -56,17 +60,31 @@ async def generate_with_timeout(client, prompt, timeout=10):
         print(f"Error in LLM generation: {e}")
         raise
 
-async def main():
-    print("Starting main execution...")
-    try:
-        # Create a single MCP server connection
-        print("Establishing connection to MCP server...")
+@asynccontextmanager
+async def connect_to_server():
+    """(read, write) streams to a shared server at MCP_SERVER_URL, or to a freshly spawned stdio server"""
+    if not server_url:
         server_params = StdioServerParameters(
             command="python",
             args=["mcp_usecase_server.py"]
         )
-
         async with stdio_client(server_params) as (read, write):
+            yield read, write
+    elif server_url.rstrip("/").endswith("/sse"):
+        from mcp.client.sse import sse_client
+        async with sse_client(server_url) as (read, write):
+            yield read, write
+    else:
+        from mcp.client.streamable_http import streamablehttp_client
+        async with streamablehttp_client(server_url) as (read, write, _):
+            yield read, write
+
+async def main():
+    print("Starting main execution...")
+    try:
+        # Create a single MCP server connection
+        print(f"Establishing connection to MCP server{f' at {server_url}' if server_url else ''}...")
+        async with connect_to_server() as (read, write):
             print("Connection established, creating session...")
             async with ClientSession(read, write) as session:
                 print("Session created, initializing...")
@@ -348,7 +366,8 @@ TROUBLESHOOTING GUIDE:
                                         elif param_info['type'] == 'number':
                                             arguments[param_name] = float(value)
                                         elif param_info['type'] == 'array':
-                                            arguments[param_name] = eval(value)
+                                            # Lists (e.g. batch_compute items) may arrive as JSON text or already parsed
+                                            arguments[param_name] = ast.literal_eval(value) if isinstance(value, str) else value
                                         else:
                                             arguments[param_name] = value
 
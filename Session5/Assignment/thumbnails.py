@@ -0,0 +1,127 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image as PILImage
+
+THUMBNAIL_SIZE = (100, 100)
+FORMATS = {"png": "PNG", "webp": "WEBP"}
+CACHE_DIR = os.getenv("THUMBNAIL_CACHE_DIR", os.path.join(tempfile.gettempdir(), "mcp_thumbnails"))
+BATCH_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", str(min(4, os.cpu_count() or 1))))
+MAX_BATCH = 500
+
+
+def cache_path(image_path, size=THUMBNAIL_SIZE, fmt="png"):
+    """Cache file for an image's thumbnail, keyed by path, mtime, file size and thumbnail options"""
+    path = os.path.abspath(image_path)
+    stat = os.stat(path)
+    key = f"{path}|{stat.st_mtime_ns}|{stat.st_size}|{size[0]}x{size[1]}|{fmt}"
+    return os.path.join(CACHE_DIR, f"{hashlib.sha1(key.encode()).hexdigest()}.{fmt}")
+
+
+def render(image_path, size=THUMBNAIL_SIZE, fmt="png"):
+    """Decode, shrink and encode one thumbnail; returns the encoded bytes"""
+    with PILImage.open(image_path) as img:
+        # JPEG can decode straight to a reduced scale (1/2 to 1/8), skipping the full-size decode
+        img.draft("RGB", size)
+        # Normalize first: resampling (and the encoders) reject modes such as 16-bit "I;16"
+        if img.mode.startswith("I"):
+            # 16/32-bit grayscale: scale to 8 bits (a plain convert would clip everything above 255 to white)
+            img = img.convert("I").point(lambda v: v / 256).convert("L")
+        elif img.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+        if fmt == "webp" and img.mode == "P":
+            img = img.convert("RGBA")
+        img.thumbnail(size)
+        buffer = io.BytesIO()
+        img.save(buffer, FORMATS[fmt], **({"optimize": True} if fmt == "png" else {"quality": 80}))
+    return buffer.getvalue()
+
+
+def _store(target, data):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Write then rename so concurrent readers never see a partial file
+    fd, temp = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(temp, target)
+
+
+def thumbnail(image_path, size=THUMBNAIL_SIZE, fmt="png"):
+    """(encoded thumbnail bytes, cache hit?) for one image; an unchanged file costs a stat and a read"""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    target = cache_path(image_path, size, fmt)
+    try:
+        with open(target, "rb") as f:
+            return f.read(), True
+    except FileNotFoundError:
+        pass
+    data = render(image_path, size, fmt)
+    _store(target, data)
+    return data, False
+
+
+def thumbnail_file(image_path, size=THUMBNAIL_SIZE, fmt="png"):
+    """Make sure the cached thumbnail exists and return its path (runs in batch worker processes)"""
+    target = cache_path(image_path, size, fmt)
+    if not os.path.exists(target):
+        _store(target, render(image_path, size, fmt))
+    return target
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _batch_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(BATCH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def _settle(entry, produce):
+    try:
+        produce()
+    except Exception as e:
+        entry.pop("thumbnail")
+        entry.pop("cached")
+        entry["error"] = f"{type(e).__name__}: {e}"
+
+
+def thumbnails(image_paths, size=THUMBNAIL_SIZE, fmt="png"):
+    """Thumbnail many images; cache hits are answered here, misses are rendered across worker processes.
+
+    Returns one {"image", "thumbnail", "cached"} or {"image", "error"} entry per path, in order.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    if len(image_paths) > MAX_BATCH:
+        raise ValueError(f"At most {MAX_BATCH} images per batch")
+    results = []
+    misses = []
+    for image_path in image_paths:
+        try:
+            target = cache_path(image_path, size, fmt)
+        except OSError as e:
+            results.append({"image": image_path, "error": str(e)})
+            continue
+        cached = os.path.exists(target)
+        results.append({"image": image_path, "thumbnail": target, "cached": cached})
+        if not cached:
+            misses.append(results[-1])
+    if len(misses) == 1:
+        # Not worth a process hop
+        _settle(misses[0], lambda: thumbnail_file(misses[0]["image"], size, fmt))
+    elif misses:
+        executor = _batch_executor()
+        futures = [executor.submit(thumbnail_file, entry["image"], size, fmt) for entry in misses]
+        for entry, future in zip(misses, futures):
+            _settle(entry, future.result)
+    return results
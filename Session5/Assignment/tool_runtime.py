@@ -0,0 +1,383 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("mcp_tools")
+
+# Upper bounds (ms) of the wall-time histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000, 30000)
+# Entries kept by the shared result cache of pure tools
+RESULT_CACHE_SIZE = int(os.getenv("TOOL_CACHE_SIZE", "1024"))
+# Calls whose arguments plus result exceed this many bytes are not cached
+MAX_CACHED_BYTES = int(os.getenv("TOOL_CACHE_MAX_ENTRY_BYTES", str(256 * 1024)))
+# Threads running synchronous tools off the event loop
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "8"))
+# Default seconds a tool call may take before the client gets a timeout error
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "60"))
+
+
+def payload_size(value, limit=None):
+    """Approximate JSON size in bytes of a tool argument set or result.
+
+    Estimated from lengths instead of serializing, so a multi-megabyte argument is not copied just
+    to be measured; with `limit`, counting stops as soon as the estimate exceeds it.
+    """
+    if isinstance(value, str):
+        return len(value) + 2
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if value is None or isinstance(value, bool):
+        return 5
+    if isinstance(value, int):
+        # Decimal digits from the bit length, without converting to a string
+        return value.bit_length() * 30103 // 100000 + 2
+    if isinstance(value, float):
+        return 24
+    data = getattr(value, "data", None)
+    if isinstance(data, (bytes, bytearray)):
+        # Image results are sent base64-encoded
+        return (len(data) + 2) // 3 * 4
+    text = getattr(value, "text", None)
+    if isinstance(text, str):
+        return len(text) + 2
+    if isinstance(value, dict):
+        items = (item for pair in value.items() for item in pair)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        items = value
+    else:
+        return len(str(value))
+    total = 2
+    for item in items:
+        total += payload_size(item, None if limit is None else limit - total) + 1
+        if limit is not None and total > limit:
+            break
+    return total
+
+
+class ToolStats:
+    """Counters and a wall-time histogram for one tool"""
+
+    __slots__ = ("calls", "errors", "cache_hits", "wall_seconds", "wall_max", "cpu_seconds",
+                 "bytes_in", "bytes_out", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.wall_seconds = 0.0
+        self.wall_max = 0.0
+        self.cpu_seconds = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def to_dict(self):
+        labels = [f"<={bound}ms" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "cache_hits": self.cache_hits,
+            "wall_ms_total": round(self.wall_seconds * 1000, 3),
+            "wall_ms_mean": round(self.wall_seconds * 1000 / self.calls, 3) if self.calls else 0.0,
+            "wall_ms_max": round(self.wall_max * 1000, 3),
+            "cpu_ms_total": round(self.cpu_seconds * 1000, 3),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "wall_histogram": {label: count for label, count in zip(labels, self.buckets) if count}
+        }
+
+
+class ToolMetrics:
+    """Per-tool call statistics, safe to update from worker threads"""
+
+    def __init__(self):
+        self._tools = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def record(self, name, wall, cpu, bytes_in, bytes_out, error, cached=False):
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if wall * 1000 <= bound),
+                      len(LATENCY_BUCKETS_MS))
+        with self._lock:
+            stats = self._tools.get(name)
+            if stats is None:
+                stats = self._tools[name] = ToolStats()
+            stats.calls += 1
+            stats.errors += bool(error)
+            stats.cache_hits += cached
+            stats.wall_seconds += wall
+            stats.wall_max = max(stats.wall_max, wall)
+            stats.cpu_seconds += cpu
+            stats.bytes_in += bytes_in
+            stats.bytes_out += bytes_out
+            stats.buckets[bucket] += 1
+
+    def snapshot(self):
+        """Stats per tool, most total wall time first"""
+        with self._lock:
+            tools = {name: stats.to_dict() for name, stats in self._tools.items()}
+        return {
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "tools": dict(sorted(tools.items(), key=lambda item: -item[1]["wall_ms_total"]))
+        }
+
+
+class ResultCache:
+    """LRU cache of pure tool results keyed by tool name and canonical JSON arguments"""
+
+    def __init__(self, capacity=RESULT_CACHE_SIZE, max_entry_bytes=MAX_CACHED_BYTES):
+        self.capacity = capacity
+        self.max_entry_bytes = max_entry_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    def key(self, name, args, kwargs):
+        """Cache key for a call, or None when the arguments are too big (or not JSON) to be worth keeping"""
+        # Size check first: oversized arguments are never serialized
+        if payload_size([args, kwargs], self.max_entry_bytes) > self.max_entry_bytes:
+            return None
+        try:
+            key = json.dumps([name, args, kwargs], sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        except (TypeError, ValueError):
+            return None
+        return key if len(key) <= self.max_entry_bytes else None
+
+    def get(self, key):
+        """(result, result size) for a cached call, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, result, size):
+        if self.capacity <= 0 or len(key) + size > self.max_entry_bytes:
+            with self._lock:
+                self.skipped += 1
+            return
+        with self._lock:
+            self._entries[key] = (result, size)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "skipped": self.skipped
+            }
+
+
+class SessionState:
+    """Per-client-session state for stateful tools, created on first use by `factory`.
+
+    Under the SSE / streamable HTTP transports one server process serves many sessions; each gets
+    its own state, dropped once the session object is gone. Calls outside a client request share
+    one default state.
+    """
+
+    def __init__(self, mcp, factory):
+        self.mcp = mcp
+        self.factory = factory
+        self._states = weakref.WeakKeyDictionary()
+        self._default = None
+        self._lock = threading.Lock()
+
+    def _session(self):
+        try:
+            return self.mcp.get_context().session
+        except (LookupError, ValueError):
+            return None
+
+    def get(self):
+        """State of the calling session (works from tool worker threads, which inherit the request context)"""
+        session = self._session()
+        with self._lock:
+            if session is None:
+                if self._default is None:
+                    self._default = self.factory()
+                return self._default
+            state = self._states.get(session)
+            if state is None:
+                state = self._states[session] = self.factory()
+            return state
+
+    def __len__(self):
+        with self._lock:
+            return len(self._states)
+
+
+class _CallClock:
+    """Wall time of one tool call, plus the CPU time of the thread(s) that ran it"""
+
+    __slots__ = ("started", "cpu")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.cpu = 0.0
+
+    def run(self, func, args, kwargs):
+        cpu_started = time.thread_time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.cpu += time.thread_time() - cpu_started
+
+    async def run_async(self, func, args, kwargs):
+        # Counts the event loop thread's CPU while the coroutine is pending, so it can include
+        # other coroutines that ran in between; sync tools (measured in their worker) are exact
+        cpu_started = time.thread_time()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            self.cpu += time.thread_time() - cpu_started
+
+
+class ToolRuntime:
+    """Registers MCP tools with call instrumentation (timing, counters, payload sizes, logging),
+    a shared result cache for tools marked pure, and scheduling: synchronous tools run on a
+    thread pool instead of the event loop, with per-tool (or per-group) concurrency limits and timeouts"""
+
+    def __init__(self, mcp, cache=None, workers=TOOL_WORKERS):
+        self.mcp = mcp
+        self.metrics = ToolMetrics()
+        self.cache = cache if cache is not None else ResultCache()
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="mcp-tool")
+        self.workers = workers
+        self._limits = {}
+
+    def snapshot(self):
+        """Per-tool metrics plus result cache and scheduler stats"""
+        return {
+            **self.metrics.snapshot(),
+            "cache": self.cache.stats(),
+            "scheduler": {
+                "workers": self.workers,
+                "limits": {group: limit["size"] for group, limit in self._limits.items()}
+            }
+        }
+
+    def _lookup(self, name, args, kwargs):
+        """(cache key, cached (result, size) or None) for a pure tool call"""
+        key = self.cache.key(name, args, kwargs)
+        if key is None:
+            return None, None
+        entry = self.cache.get(key)
+        if entry is not None:
+            # Answered from the cache: no compute, no payload sizing, no thread hop
+            logger.debug(f"{name} answered from cache")
+            self.metrics.record(name, 0.0, 0.0, len(key), entry[1], None, cached=True)
+        return key, entry
+
+    def _finish(self, name, clock, kwargs, result, error, key):
+        wall = time.perf_counter() - clock.started
+        bytes_out = payload_size(result) if error is None else 0
+        bytes_in = len(key) if key is not None else payload_size(kwargs)
+        self.metrics.record(name, wall, clock.cpu, bytes_in, bytes_out, error)
+        if error is None:
+            if key is not None:
+                self.cache.put(key, result, bytes_out)
+            logger.debug(f"{name} finished in {wall * 1000:.1f} ms ({bytes_out} bytes)")
+        else:
+            logger.warning(f"{name} failed after {wall * 1000:.1f} ms: {type(error).__name__}: {error}")
+
+    def _limit(self, group, size):
+        """Semaphore shared by every tool registered with the same group"""
+        limit = self._limits.get(group)
+        if limit is None:
+            limit = self._limits[group] = {"size": size, "semaphore": asyncio.Semaphore(size)}
+        elif limit["size"] != size:
+            raise ValueError(f"Concurrency group {group!r} already has a limit of {limit['size']}")
+        return limit["semaphore"]
+
+    async def _run_sync(self, clock, func, args, kwargs, limit):
+        """Run a sync tool on the thread pool; the limit slot is held until the thread finishes"""
+        if limit is not None:
+            await limit.acquire()
+        try:
+            # Worker threads see the caller's context variables
+            context = contextvars.copy_context()
+            future = asyncio.get_running_loop().run_in_executor(
+                self.executor, context.run, clock.run, func, args, kwargs)
+        except BaseException:
+            if limit is not None:
+                limit.release()
+            raise
+        if limit is not None:
+            future.add_done_callback(lambda _: limit.release())
+        # A timed-out thread cannot be stopped, so shield it and let it finish in the background
+        return await asyncio.shield(future)
+
+    async def _run_async(self, clock, func, args, kwargs, limit):
+        if limit is None:
+            return await clock.run_async(func, args, kwargs)
+        async with limit:
+            return await clock.run_async(func, args, kwargs)
+
+    def instrument(self, func, name, pure=False, concurrency=None, group=None, timeout=TOOL_TIMEOUT):
+        """Wrap a tool function so every call is timed and counted, pure calls are memoized and
+        the call is scheduled off the event loop (sync tools) within its limits"""
+        limit = self._limit(group or name, concurrency) if concurrency else None
+        run = self._run_async if inspect.iscoroutinefunction(func) else self._run_sync
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            logger.info(f"CALLED: {name}")
+            key, entry = self._lookup(name, args, kwargs) if pure else (None, None)
+            if entry is not None:
+                return entry[0]
+            clock = _CallClock()
+            result = error = None
+            try:
+                result = await asyncio.wait_for(run(clock, func, args, kwargs, limit), timeout)
+                return result
+            except asyncio.TimeoutError:
+                error = TimeoutError(f"{name} did not finish within {timeout:g}s")
+                raise error from None
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self._finish(name, clock, kwargs, result, error, key)
+        return wrapper
+
+    def tool(self, name=None, description=None, pure=False, concurrency=None, group=None, timeout=TOOL_TIMEOUT):
+        """Drop-in replacement for @mcp.tool() that instruments and schedules the tool.
+
+        pure=True declares that the result depends only on the arguments and the call has no side
+        effects, so repeated calls are answered from the shared result cache.
+        concurrency caps simultaneous calls of the tool, or of all tools sharing `group`.
+        timeout (seconds, None for no limit) bounds each call as seen by the client.
+        """
+        def decorator(func):
+            tool_name = name or func.__name__
+            wrapper = self.instrument(func, tool_name, pure, concurrency, group, timeout)
+            self.mcp.tool(name=tool_name, description=description)(wrapper)
+            # The module keeps the plain function so tools can call each other without double counting
+            return func
+        return decorator